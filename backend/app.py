@@ -3,27 +3,49 @@ os.environ["PATH"] += os.pathsep + r"C:\ffmpeg\bin"
 import uuid
 import logging
 from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Tuple
 from pathlib import Path
-import tempfile
 import json
 from functools import wraps
 import io
+import csv
 import wave
-
-from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, Header
+import asyncio
+import time
+import base64
+import argparse
+import re
+import hashlib
+from collections import OrderedDict
+
+from fastapi import FastAPI, HTTPException, Depends, Header, Request, WebSocket, WebSocketDisconnect, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from sqlalchemy import create_engine, Column, String, Integer, DateTime, Boolean, Text, ForeignKey, desc, and_
+from fastapi.responses import StreamingResponse
+from fastapi.encoders import jsonable_encoder
+from starlette.formparsers import MultiPartParser
+from sqlalchemy import Column, String, Integer, DateTime, Boolean, Text, ForeignKey, Index, desc, and_, tuple_, func, inspect, select, text as sql_text
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session, relationship
+from sqlalchemy.orm import sessionmaker, Session, relationship, joinedload
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from pydantic import BaseModel, EmailStr
-import whisper
-import uvicorn
-import firebase_admin
-from firebase_admin import credentials, auth
 from dotenv import load_dotenv
-from openai import OpenAI
+from openai import AsyncOpenAI
+
+from transcription import TranscriptionPool, TranscriptionQueueFull, TranscriptionUnavailable, StreamingDecoder, SAMPLE_RATE
+from database import create_db_engine, create_async_db_engine, pool_stats
+from rp_classifier import rp_classifier, needs_llm
+from embeddings import NoteIndex
+from auth_cache import ExpiringLRU, PublicKeyCache, FirebaseTokenVerifier
+from providers import Provider, ProviderUnavailable
+from audio import prepare_audio, trim_silence, AudioDecodeError, AudioTooLong
+
+# Optional columnar export support
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
 
 # Load environment variables
 load_dotenv()
@@ -32,25 +54,59 @@ load_dotenv()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize Firebase Admin
-try:
-    cred = credentials.Certificate("firebase_admin_key.json")
-    firebase_admin.initialize_app(cred)
-except Exception as e:
-    logger.warning(f"Firebase initialization warning: {e}")
-    # Continue without Firebase for testing
+# ID token verification - decoded tokens cached until their exp, signing keys until their max-age
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv("AUTH_TOKEN_CACHE_SIZE", "10000"))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "1000"))
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", "300"))  # seconds before a user's row is re-read
+token_cache = ExpiringLRU(AUTH_TOKEN_CACHE_SIZE)
+user_cache = ExpiringLRU(AUTH_USER_CACHE_SIZE)
+
+firebase_verifier: Optional[FirebaseTokenVerifier] = None
+
+def init_firebase():
+    """Initialize Firebase Admin and return the ID token verify function (runs in a thread)"""
+    global firebase_verifier
+    import firebase_admin
+    from firebase_admin import credentials, auth
+    try:
+        cred = credentials.Certificate("firebase_admin_key.json")
+        firebase_admin.initialize_app(cred)
+    except Exception as e:
+        logger.warning(f"Firebase initialization warning: {e}")
+        # Continue without Firebase for testing
+    
+    project_id = os.getenv("FIREBASE_PROJECT_ID") or os.getenv("GOOGLE_CLOUD_PROJECT")
+    if not project_id:
+        try:
+            project_id = firebase_admin.get_app().project_id
+        except ValueError:  # Firebase not initialized
+            pass
+    
+    # Without a project ID tokens go through auth.verify_id_token (still cached)
+    if not project_id:
+        return auth.verify_id_token
+    firebase_verifier = FirebaseTokenVerifier(
+        project_id,
+        PublicKeyCache(certs_file=os.getenv("FIREBASE_CERTS_FILE"))
+    )
+    return firebase_verifier.verify
+
+firebase_provider = Provider("firebase", lambda: asyncio.to_thread(init_firebase))
 
 # Initialize OpenAI
 OPENAI_API_KEY = ''
-openai_client = OpenAI(api_key=OPENAI_API_KEY)
+# Shared async client used by request handlers so runs never block the event loop
+async_openai_client = AsyncOpenAI(api_key=OPENAI_API_KEY)
 
-# Create or retrieve the assistant
-ASSISTANT_ID = os.getenv("OPENAI_ASSISTANT_ID")
-if not ASSISTANT_ID:
-    # Create assistant if it doesn't exist
-    assistant = openai_client.beta.assistants.create(
-        name="CareIQ Assistant",
-        instructions="""You are CareIQ Assistant (Nova), an AI coach for support workers in disability care settings. Your role is to:
+# Assistant run polling settings
+OPENAI_RUN_TIMEOUT = float(os.getenv("OPENAI_RUN_TIMEOUT", "60"))
+OPENAI_POLL_INITIAL = float(os.getenv("OPENAI_POLL_INITIAL", "0.25"))
+OPENAI_POLL_MAX = float(os.getenv("OPENAI_POLL_MAX", "2.0"))
+RUN_TERMINAL_FAILURES = {"failed", "cancelled", "expired", "incomplete", "requires_action"}
+
+# Nova system prompt, shared by the Assistant and Chat Completions backends
+ASSISTANT_MODEL = os.getenv("OPENAI_MODEL", "gpt-4.1-mini")
+ASSISTANT_INSTRUCTIONS = """You are CareIQ Assistant (Nova), an AI coach for support workers in disability care settings. Your role is to:
 
 1. Detect and flag restrictive practices in progress notes
 2. Provide guidance on de-escalation and person-centered alternatives
@@ -75,17 +131,68 @@ Always respond in JSON format with these fields:
   "alternatives": ["list of suggested alternatives"]
 }
 
-Keep responses concise, supportive, and focused on practical solutions.""",
-        model="gpt-4.1-mini",
+Keep responses concise, supportive, and focused on practical solutions."""
+
+# JSON schema matching the fields requested in ASSISTANT_INSTRUCTIONS
+ANALYSIS_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "rp_flag": {"type": "boolean"},
+        "detected_practices": {"type": "array", "items": {"type": "string"}},
+        "tags": {"type": "array", "items": {"type": "string"}},
+        "intent": {"type": "string", "enum": ["note", "question", "warning"]},
+        "response": {"type": "string"},
+        "severity": {"type": "string", "enum": ["low", "medium", "high"]},
+        "alternatives": {"type": "array", "items": {"type": "string"}}
+    },
+    "required": ["rp_flag", "detected_practices", "tags", "intent", "response", "severity", "alternatives"],
+    "additionalProperties": False
+}
+
+# "chat" sends one structured-output chat completion per call,
+# "assistant" uses the Assistants API thread/run flow
+OPENAI_BACKEND = os.getenv("OPENAI_BACKEND", "chat")
+
+# Assistant to run, created on first use when not configured
+ASSISTANT_ID = os.getenv("OPENAI_ASSISTANT_ID")
+
+async def load_assistant() -> Optional[str]:
+    if OPENAI_BACKEND != "assistant":
+        return None
+    if ASSISTANT_ID:
+        return ASSISTANT_ID
+    # Create assistant if it doesn't exist
+    assistant = await async_openai_client.beta.assistants.create(
+        name="CareIQ Assistant",
+        instructions=ASSISTANT_INSTRUCTIONS,
+        model=ASSISTANT_MODEL,
         response_format={"type": "json_object"}
     )
-    ASSISTANT_ID = assistant.id
-    logger.info(f"Created new assistant with ID: {ASSISTANT_ID}")
+    logger.info(f"Created new assistant with ID: {assistant.id}")
+    return assistant.id
+
+assistant_provider = Provider("openai_assistant", load_assistant)
 
 # Database setup
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./careiq.db")
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False} if DATABASE_URL.startswith("sqlite") else {})
+engine = create_db_engine(DATABASE_URL)  # pool and SQLite pragmas configured in database.py
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Request handlers use the async engine (aiosqlite/asyncpg) so queries don't block the event loop.
+# Background work (analysis workers, re-analysis, stats reconciliation, the analysis cache) keeps
+# the sync engine but runs it through asyncio.to_thread; only the CLI calls it directly.
+async_engine = create_async_db_engine(DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+def in_session(fn, *args):
+    """Call fn(db, *args) with a fresh sync session - run it with asyncio.to_thread"""
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 Base = declarative_base()
 
 # Initialize FastAPI app
@@ -98,16 +205,105 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag"],
 )
 
-# Load Whisper model
+# Whisper transcription pool - each worker process loads the model once, in the background after startup
 whisper_model_name = os.getenv("WHISPER_MODEL", "base")
-logger.info(f"Loading Whisper model: {whisper_model_name}")
-try:
-    whisper_model = whisper.load_model(whisper_model_name)
-except Exception as e:
-    logger.warning(f"Failed to load Whisper model: {e}. Will use mock transcription.")
-    whisper_model = None
+transcription_pool = TranscriptionPool(
+    model_name=whisper_model_name,
+    workers=int(os.getenv("WHISPER_WORKERS", "1")),  # 0 = background thread in this process
+    max_queue=int(os.getenv("WHISPER_QUEUE_SIZE", "8")),
+    batch_size=int(os.getenv("WHISPER_BATCH_SIZE", "0")),  # opt-in: segments decoded together, 0 = transcribe() per request
+    batch_wait_ms=int(os.getenv("WHISPER_BATCH_WAIT_MS", "50"))  # how long the first segment waits for company
+)
+WHISPER_RETRY_AFTER = int(os.getenv("WHISPER_RETRY_AFTER", "15"))  # seconds
+WHISPER_STREAM_WINDOW = int(os.getenv("WHISPER_STREAM_WINDOW", "30"))  # seconds per partial transcript
+WHISPER_STREAM_IDLE_SECONDS = float(os.getenv("WHISPER_STREAM_IDLE_SECONDS", "30"))  # max gap between stream frames
+
+async def load_whisper() -> TranscriptionPool:
+    """Start the worker pool, failing (to be retried) unless every worker loaded the model"""
+    transcription_pool.shutdown()  # executor left behind by a failed attempt
+    await transcription_pool.start()
+    if not transcription_pool.model_loaded:
+        transcription_pool.shutdown()
+        raise RuntimeError(f"Whisper model {whisper_model_name} did not load")
+    return transcription_pool
+
+# Voice endpoints answer 503 until the model is warm; other traffic doesn't wait for it
+whisper_provider = Provider("whisper", load_whisper, required=False)
+# Uploads are decoded in memory; these bound what one request or voice stream can buffer
+AUDIO_MAX_UPLOAD_BYTES = int(os.getenv("AUDIO_MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+AUDIO_MAX_SECONDS = float(os.getenv("AUDIO_MAX_SECONDS", "600"))  # 600s = 19 MB PCM + 38 MB float32
+MULTIPART_OVERHEAD_BYTES = 16 * 1024  # boundaries, part headers and the participant_id field
+
+class AudioUploadParser(MultiPartParser):
+    """Multipart parser for voice uploads only: files up to the cap stay in memory instead of a temp file"""
+    max_file_size = AUDIO_MAX_UPLOAD_BYTES
+
+async def read_voice_upload(request: Request) -> Tuple[str, bytes]:
+    """(participant_id, audio bytes) from a multipart upload, rejected on Content-Length before any body is read"""
+    length = request.headers.get("content-length")
+    if length is None:
+        raise HTTPException(status_code=411, detail="Content-Length required")
+    if not length.isdigit() or int(length) > AUDIO_MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES:
+        raise HTTPException(status_code=413, detail="Recording too large")
+    if not request.headers.get("content-type", "").startswith("multipart/form-data"):
+        raise HTTPException(status_code=415, detail="Expected multipart/form-data")
+    
+    form = await AudioUploadParser(request.headers, request.stream(), max_files=1, max_fields=10).parse()
+    audio, participant_id = form.get("audio"), form.get("participant_id")
+    if audio is None or isinstance(audio, str) or not isinstance(participant_id, str):
+        raise HTTPException(status_code=422, detail="Form fields audio (file) and participant_id are required")
+    try:
+        data = await audio.read()
+    finally:
+        await audio.close()
+    if len(data) > AUDIO_MAX_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail="Recording too large")
+    return participant_id, data
+
+VOICE_UPLOAD_OPENAPI = {
+    "requestBody": {
+        "required": True,
+        "content": {"multipart/form-data": {"schema": {
+            "type": "object",
+            "required": ["audio", "participant_id"],
+            "properties": {"audio": {"type": "string", "format": "binary"}, "participant_id": {"type": "string"}},
+        }}},
+    }
+}
+# Seconds of audio received vs sent to Whisper after silence trimming
+audio_trim_stats = {"recordings": 0, "audio_seconds_total": 0.0, "speech_seconds_total": 0.0, "peak_bytes_max": 0}
+
+def record_audio_trim(duration: float, speech_duration: float, peak_bytes: int = 0):
+    audio_trim_stats["recordings"] += 1
+    audio_trim_stats["audio_seconds_total"] += duration
+    audio_trim_stats["speech_seconds_total"] += speech_duration
+    audio_trim_stats["peak_bytes_max"] = max(audio_trim_stats["peak_bytes_max"], peak_bytes)
+
+# Similar-note retrieval - embedding index stored next to the database
+note_index = NoteIndex(
+    directory=os.getenv("NOTE_INDEX_DIR", "./note_index"),
+    model_name=os.getenv("NOTE_EMBEDDING_MODEL", "all-MiniLM-L6-v2")  # "hashing" = no model download
+)
+NOTE_INDEX_BATCH = int(os.getenv("NOTE_INDEX_BATCH", "256"))
+NOVA_SIMILAR_NOTES = int(os.getenv("NOVA_SIMILAR_NOTES", "3"))  # past notes added to Nova's context, 0 = off
+# Model load and backfill run in a thread; similar-note lookups return 503 until ready
+note_index_provider = Provider("note_index", lambda: asyncio.to_thread(sync_note_index), required=False)
+
+# Schema creation and migrations, FTS setup and sample data run in a thread after startup;
+# database dependencies wait for them, /api/health does not
+database_provider = Provider("database", lambda: asyncio.to_thread(setup_database))
+# Training trigger counters and stats reconciliation over the whole notes table
+activity_provider = Provider("activity", lambda: load_activity(), required=False)
+
+# Everything loaded after startup, reported by /api/ready
+providers = {
+    provider.name: provider
+    for provider in (database_provider, firebase_provider, assistant_provider, whisper_provider,
+                     note_index_provider, activity_provider)
+}
 
 # Database Models
 class User(Base):
@@ -145,10 +341,49 @@ class Note(Base):
     rp_flag = Column(Boolean, default=False)
     gpt_response = Column(Text, nullable=True)
     audio_duration = Column(Integer, nullable=True)  # seconds
+    analysis_status = Column(String, nullable=False, default="complete")  # pending/complete/failed
+    # Structured copy of gpt_response, null until the note is analyzed
+    severity = Column(String, nullable=True)  # low/medium/high
+    intent = Column(String, nullable=True)  # note/question/warning
     
     # Relationships
     user = relationship("User", back_populates="notes")
     participant = relationship("Participant", back_populates="notes")
+    practices = relationship("NotePractice", back_populates="note", cascade="all, delete-orphan")
+    
+    __table_args__ = (
+        # Per-user activity (my notes, training triggers)
+        Index("ix_notes_user_timestamp", "user_id", "timestamp"),
+        # RP incidents per user in the last 24h - partial so it only holds flagged notes
+        Index(
+            "ix_notes_user_rp_timestamp", "user_id", "timestamp",
+            sqlite_where=sql_text("rp_flag = 1"),
+            postgresql_where=sql_text("rp_flag = true")
+        ),
+        # Participant history pages, exports and note counts
+        Index("ix_notes_participant_timestamp", "participant_id", "timestamp", "id"),
+        # Newest-first listing, keyset pagination and date-range exports
+        Index("ix_notes_timestamp_id", "timestamp", "id"),
+        # Severity filters and counts
+        Index("ix_notes_severity_timestamp", "severity", "timestamp"),
+    )
+
+class NotePractice(Base):
+    __tablename__ = "note_practices"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    note_id = Column(String, ForeignKey("notes.id"), nullable=False)
+    practice = Column(String, nullable=False)  # lower-cased detected practice
+    category = Column(String, nullable=True)  # physical/environmental/chemical/mechanical/seclusion
+    
+    # Relationships
+    note = relationship("Note", back_populates="practices")
+    
+    __table_args__ = (
+        Index("ix_note_practices_note", "note_id"),
+        Index("ix_note_practices_practice_note", "practice", "note_id"),
+        Index("ix_note_practices_category_note", "category", "note_id"),
+    )
 
 class QueryLog(Base):
     __tablename__ = "query_logs"
@@ -163,9 +398,218 @@ class QueryLog(Base):
     
     # Relationships
     user = relationship("User", back_populates="queries")
+    
+    __table_args__ = (
+        Index("ix_query_logs_user_timestamp", "user_id", "timestamp"),
+    )
+
+class AnalysisCache(Base):
+    __tablename__ = "analysis_cache"
+    
+    key = Column(String, primary_key=True)  # sha256 of model, prompt version and normalized text
+    result = Column(Text, nullable=False)  # analysis JSON
+    created_at = Column(DateTime, default=datetime.utcnow)
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+class StatsCounter(Base):
+    __tablename__ = "stats_counters"
+    
+    key = Column(String, primary_key=True)  # notes, rp_notes, participants, user_notes:<user_id>
+    value = Column(Integer, nullable=False, default=0)
+
+class ReanalysisJob(Base):
+    __tablename__ = "reanalysis_jobs"
+    
+    id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
+    status = Column(String, nullable=False, default="pending")  # pending/running/complete/failed
+    participant_id = Column(String, nullable=True)
+    start_date = Column(DateTime, nullable=True)
+    end_date = Column(DateTime, nullable=True)
+    batch_size = Column(Integer, nullable=False, default=200)
+    concurrency = Column(Integer, nullable=False, default=8)
+    # Keyset checkpoint: last (timestamp, id) written back
+    cursor_timestamp = Column(DateTime, nullable=True)
+    cursor_note_id = Column(String, nullable=True)
+    processed = Column(Integer, nullable=False, default=0)
+    flagged = Column(Integer, nullable=False, default=0)
+    changed = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Structured analysis columns
+def analysis_columns(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "severity": analysis.get("severity"),
+        "intent": analysis.get("intent"),
+    }
+
+def practice_rows(analysis: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """One row per distinct detected practice, tagged with its category (LLM names are free text)"""
+    names = []
+    for practice in analysis.get("detected_practices") or []:
+        name = str(practice).strip().lower()
+        if name and name not in names:
+            names.append(name)
+    return [{"practice": name, "category": rp_classifier.categorize(name)} for name in names]
+
+def apply_analysis(note: "Note", analysis: Dict[str, Any]):
+    """Store an analysis on a note: the JSON blob plus its structured columns"""
+    note.rp_flag = analysis["rp_flag"]
+    note.gpt_response = json.dumps(analysis)
+    for key, value in analysis_columns(analysis).items():
+        setattr(note, key, value)
+    note.practices = [NotePractice(**row) for row in practice_rows(analysis)]
+
+def replace_note_practices(db: Session, analyses: Dict[str, Dict[str, Any]]):
+    """Bulk-replace the practice rows of many notes, keyed by note id"""
+    db.query(NotePractice).filter(NotePractice.note_id.in_(list(analyses))).delete(synchronize_session=False)
+    db.bulk_insert_mappings(NotePractice, [
+        {"note_id": note_id, **row}
+        for note_id, analysis in analyses.items()
+        for row in practice_rows(analysis)
+    ])
+
+def backfill_note_analysis(batch_size: int = 1000) -> int:
+    """Copy severity, intent and practices out of stored gpt_response blobs"""
+    db = SessionLocal()
+    filled = 0
+    last_id = ""
+    try:
+        while True:
+            batch = db.query(Note.id, Note.gpt_response).filter(
+                Note.gpt_response.isnot(None),
+                Note.severity.is_(None),
+                Note.id > last_id
+            ).order_by(Note.id).limit(batch_size).all()
+            if not batch:
+                break
+            last_id = batch[-1].id
+            
+            analyses = {}
+            for note_id, blob in batch:
+                try:
+                    analyses[note_id] = json.loads(blob)
+                except ValueError:
+                    logger.warning(f"Skipping unparseable analysis for note {note_id}")
+            
+            db.bulk_update_mappings(Note, [
+                {"id": note_id, **analysis_columns(analysis)}
+                for note_id, analysis in analyses.items()
+            ])
+            replace_note_practices(db, analyses)
+            db.commit()
+            filled += len(analyses)
+    finally:
+        db.close()
+    if filled:
+        logger.info(f"Backfilled structured analysis for {filled} notes")
+    return filled
+
+def backfill_practice_categories() -> int:
+    """Categorize practice rows stored before free-text LLM practice names were categorized"""
+    db = SessionLocal()
+    updated = 0
+    try:
+        uncategorized = [p for (p,) in db.query(NotePractice.practice).filter(NotePractice.category.is_(None)).distinct()]
+        for practice in uncategorized:
+            category = rp_classifier.categorize(practice)
+            if category:
+                updated += db.query(NotePractice).filter(
+                    NotePractice.practice == practice,
+                    NotePractice.category.is_(None)
+                ).update({NotePractice.category: category}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+    if updated:
+        logger.info(f"Categorized {updated} stored practices")
+    return updated
+
+# Add columns introduced after the first release to existing databases
+def migrate_schema():
+    """Add missing columns and indexes to tables created by older versions"""
+    added_columns = {
+        "notes": {
+            "analysis_status": "VARCHAR NOT NULL DEFAULT 'complete'",
+            "severity": "VARCHAR",
+            "intent": "VARCHAR",
+        },
+    }
+    inspector = inspect(engine)
+    new_columns = set()
+    with engine.begin() as conn:
+        for table, columns in added_columns.items():
+            existing = {c["name"] for c in inspector.get_columns(table)}
+            for name, ddl in columns.items():
+                if name not in existing:
+                    conn.execute(sql_text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
+                    new_columns.add(f"{table}.{name}")
+                    logger.info(f"Added column {table}.{name}")
+        
+        # create_all only builds indexes together with new tables
+        for table in Base.metadata.sorted_tables:
+            existing = {i["name"] for i in inspector.get_indexes(table.name)} if inspector.has_table(table.name) else set()
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(bind=conn, checkfirst=True)
+                    logger.info(f"Created index {index.name}")
+    
+    if "notes.severity" in new_columns:
+        backfill_note_analysis()
+    backfill_practice_categories()
+
+# Full-text search over note text
+# SQLite: an external-content FTS5 table kept in sync by triggers. participant_id is
+# indexed as a second column so participant filters are resolved inside FTS5.
+# Postgres: a generated tsvector column with a GIN index.
+note_search_backend: Optional[str] = None  # fts5/tsvector, None when unavailable
+SEARCH_CANDIDATES = int(os.getenv("SEARCH_CANDIDATES", "5000"))  # newest matches considered for ranking
+
+SQLITE_NOTE_SEARCH_DDL = [
+    """CREATE VIRTUAL TABLE notes_fts USING fts5(
+        text, participant_id, content='notes', content_rowid='rowid', tokenize='porter unicode61'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+        INSERT INTO notes_fts(rowid, text, participant_id) VALUES (new.rowid, new.text, new.participant_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, text, participant_id) VALUES ('delete', old.rowid, old.text, old.participant_id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE OF text, participant_id ON notes BEGIN
+        INSERT INTO notes_fts(notes_fts, rowid, text, participant_id) VALUES ('delete', old.rowid, old.text, old.participant_id);
+        INSERT INTO notes_fts(rowid, text, participant_id) VALUES (new.rowid, new.text, new.participant_id);
+    END""",
+]
+
+POSTGRES_NOTE_SEARCH_DDL = [
+    "ALTER TABLE notes ADD COLUMN IF NOT EXISTS text_search tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', coalesce(text, ''))) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_notes_text_search ON notes USING GIN (text_search)",
+]
+
+def setup_note_search():
+    """Create the search index for the current database and index existing notes"""
+    global note_search_backend
+    try:
+        with engine.begin() as conn:
+            if engine.dialect.name == "postgresql":
+                for ddl in POSTGRES_NOTE_SEARCH_DDL:
+                    conn.execute(sql_text(ddl))
+                note_search_backend = "tsvector"
+            elif engine.dialect.name == "sqlite":
+                created = not inspect(conn).has_table("notes_fts")
+                if created:
+                    conn.execute(sql_text(SQLITE_NOTE_SEARCH_DDL[0]))
+                for ddl in SQLITE_NOTE_SEARCH_DDL[1:]:
+                    conn.execute(sql_text(ddl))
+                if created:
+                    conn.execute(sql_text("INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')"))
+                    logger.info("Built notes_fts search index")
+                note_search_backend = "fts5"
+    except Exception as e:
+        logger.warning(f"Full-text search unavailable: {e}")
+        note_search_backend = None
 
 # Pydantic Models
 class UserCreate(BaseModel):
@@ -207,6 +651,8 @@ class NoteResponse(BaseModel):
     participant_name: Optional[str]
     user_name: Optional[str]
     audio_duration: Optional[int]
+    analysis_status: str = "complete"
+    severity: Optional[str] = None
 
 class VoiceTranscriptionResponse(BaseModel):
     note_id: str
@@ -216,6 +662,13 @@ class VoiceTranscriptionResponse(BaseModel):
     timestamp: datetime
     rp_flag: bool
     audio_duration: int
+    analysis_status: str = "complete"
+
+class NoteAnalysisStatus(BaseModel):
+    note_id: str
+    analysis_status: str
+    rp_flag: bool
+    gpt_response: Optional[str]
 
 class AskNovaRequest(BaseModel):
     question: str
@@ -230,6 +683,51 @@ class AskNovaResponse(BaseModel):
     rp_flag: bool = False
     alternatives: List[str] = []
 
+class ReanalysisRequest(BaseModel):
+    participant_id: Optional[str] = None
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    batch_size: int = 200
+    concurrency: int = 8
+    resume_job_id: Optional[str] = None
+
+class NoteSearchResult(BaseModel):
+    id: str
+    participant_id: str
+    participant_name: Optional[str]
+    user_id: str
+    user_name: Optional[str]
+    timestamp: datetime
+    rp_flag: bool
+    severity: Optional[str]
+    snippet: str
+    rank: float
+
+class SimilarNote(BaseModel):
+    id: str
+    participant_id: str
+    participant_name: Optional[str]
+    user_name: Optional[str]
+    text: str
+    timestamp: datetime
+    rp_flag: bool
+    severity: Optional[str]
+    score: float
+
+class ReanalysisJobResponse(BaseModel):
+    id: str
+    status: str
+    participant_id: Optional[str]
+    start_date: Optional[datetime]
+    end_date: Optional[datetime]
+    processed: int
+    flagged: int
+    changed: int
+    cursor_timestamp: Optional[datetime]
+    error: Optional[str]
+    created_at: datetime
+    updated_at: datetime
+
 class TrainingCompletion(Base):
     __tablename__ = "training_completions"
     
@@ -250,6 +748,22 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    if not database_provider.ready:
+        try:
+            await database_provider.get()
+        except ProviderUnavailable as e:
+            raise HTTPException(status_code=503, detail=str(e))
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def setup_database():
+    """Create tables, migrate older schemas and set up search (runs in a thread after startup)"""
+    Base.metadata.create_all(bind=engine)
+    migrate_schema()
+    setup_note_search()
+    in_session(init_sample_data)
+
 # Firebase authentication decorator
 async def verify_firebase_token(authorization: str = Header(None)):
     # Allow testing without Firebase
@@ -261,22 +775,35 @@ async def verify_firebase_token(authorization: str = Header(None)):
     
     token = authorization.split("Bearer ")[1]
     
-    try:
-        decoded_token = auth.verify_id_token(token)
+    decoded_token = token_cache.get(token)
+    if decoded_token is not None:
         return decoded_token
+    
+    try:
+        verify = await firebase_provider.get()
+        # Key refreshes do network I/O, keep them off the event loop
+        decoded_token = await asyncio.to_thread(verify, token)
     except Exception as e:
         logger.error(f"Firebase auth error: {str(e)}")
         raise HTTPException(status_code=401, detail="Invalid or expired token")
+    
+    token_cache.put(token, decoded_token, decoded_token["exp"])
+    return decoded_token
 
 # Get current user from Firebase token
 async def get_current_user(
     token_data: dict = Depends(verify_firebase_token),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
     firebase_uid = token_data["uid"]
     
+    # Handlers only read the user, so a detached copy can be shared between requests
+    user = user_cache.get(firebase_uid)
+    if user is not None:
+        return user
+    
     # Get or create user
-    user = db.query(User).filter(User.firebase_uid == firebase_uid).first()
+    user = (await db.execute(select(User).filter(User.firebase_uid == firebase_uid))).scalars().first()
     
     if not user:
         # Create new user from Firebase data
@@ -287,49 +814,223 @@ async def get_current_user(
             role="staff"
         )
         db.add(user)
-        db.commit()
-        db.refresh(user)
+        await db.commit()
+        await db.refresh(user)
     
+    user_cache.put(firebase_uid, user, time.time() + AUTH_USER_CACHE_TTL)
     return user
 
-# Helper function for OpenAI GPT-4 analysis
-async def analyze_with_gpt4(text: str, context: Dict[str, Any] = {}) -> Dict[str, Any]:
-    """Analyze text with GPT-4 using Assistant API"""
-    try:
-        # Create a thread
-        thread = openai_client.beta.threads.create()
-        
-        # Add message to thread
-        message = openai_client.beta.threads.messages.create(
+# Helper to run the assistant on a fresh thread without blocking the event loop
+async def run_assistant(content: str, delete_thread: bool = False) -> Tuple[str, str]:
+    """Post a message to a new thread, run the assistant and return (thread_id, reply text)"""
+    thread = await async_openai_client.beta.threads.create()
+    
+    await async_openai_client.beta.threads.messages.create(
+        thread_id=thread.id,
+        role="user",
+        content=content
+    )
+    
+    run = await async_openai_client.beta.threads.runs.create(
+        thread_id=thread.id,
+        assistant_id=await assistant_provider.get()
+    )
+    
+    # Poll with exponential backoff until the run finishes or the deadline passes
+    deadline = time.monotonic() + OPENAI_RUN_TIMEOUT
+    delay = OPENAI_POLL_INITIAL
+    while run.status != "completed":
+        if run.status in RUN_TERMINAL_FAILURES:
+            raise Exception(f"Assistant run {run.status}")
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            try:
+                await async_openai_client.beta.threads.runs.cancel(
+                    thread_id=thread.id,
+                    run_id=run.id
+                )
+            except Exception as e:
+                logger.warning(f"Failed to cancel timed out run {run.id}: {e}")
+            raise Exception(f"Assistant run timed out after {OPENAI_RUN_TIMEOUT}s")
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * 2, OPENAI_POLL_MAX)
+        run = await async_openai_client.beta.threads.runs.retrieve(
             thread_id=thread.id,
-            role="user",
-            content=f"Analyze this note for restrictive practices: {text}"
+            run_id=run.id
         )
-        
-        # Run the assistant
-        run = openai_client.beta.threads.runs.create(
-            thread_id=thread.id,
-            assistant_id=ASSISTANT_ID
+    
+    # Get the response
+    messages = await async_openai_client.beta.threads.messages.list(thread_id=thread.id, limit=1)
+    reply = messages.data[0].content[0].text.value
+    
+    if delete_thread:
+        try:
+            await async_openai_client.beta.threads.delete(thread.id)
+        except Exception as e:
+            logger.warning(f"Failed to delete thread {thread.id}: {e}")
+    return thread.id, reply
+
+# RP analysis cache
+# Bump ANALYSIS_PROMPT_VERSION whenever the analysis prompt changes so old results are not reused
+ANALYSIS_PROMPT_VERSION = "1"
+ANALYSIS_CACHE_MAX = int(os.getenv("ANALYSIS_CACHE_MAX", "10000"))  # rows kept in the database, 0 disables
+ANALYSIS_CACHE_MEMORY = int(os.getenv("ANALYSIS_CACHE_MEMORY", "1024"))  # hot entries kept in process
+ANALYSIS_CACHE_TTL = timedelta(seconds=int(os.getenv("ANALYSIS_CACHE_TTL", str(7 * 24 * 3600))))
+ANALYSIS_CACHE_PRUNE_EVERY = int(os.getenv("ANALYSIS_CACHE_PRUNE_EVERY", "100"))  # writes between eviction passes
+analysis_cache_memory: "OrderedDict[str, Tuple[datetime, Dict[str, Any]]]" = OrderedDict()
+analysis_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+analysis_cache_writes = 0  # since the last eviction pass
+
+def normalize_note_text(text: str) -> str:
+    """Collapse case, whitespace and trailing punctuation so re-submits hash the same"""
+    return re.sub(r"\s+", " ", text).strip().lower().rstrip(".!? ")
+
+def analysis_cache_key(text: str) -> str:
+    # An assistant created on first use always carries ASSISTANT_INSTRUCTIONS, so key it by model
+    if OPENAI_BACKEND == "assistant":
+        model_id = ASSISTANT_ID or f"assistant:{ASSISTANT_MODEL}"
+    else:
+        model_id = f"chat:{ASSISTANT_MODEL}"
+    raw = f"{model_id}|{ANALYSIS_PROMPT_VERSION}|{normalize_note_text(text)}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def remember_analysis(key: str, expires_at: datetime, result: Dict[str, Any]):
+    analysis_cache_memory[key] = (expires_at, result)
+    analysis_cache_memory.move_to_end(key)
+    while len(analysis_cache_memory) > ANALYSIS_CACHE_MEMORY:
+        analysis_cache_memory.popitem(last=False)
+
+def load_cached_analysis_row(key: str, now: datetime) -> Optional[Tuple[datetime, Dict[str, Any]]]:
+    """Read a live cache row and touch its last_used_at (runs in a thread)"""
+    db = SessionLocal()
+    try:
+        row = db.query(AnalysisCache).filter(AnalysisCache.key == key).first()
+        if not row or row.created_at + ANALYSIS_CACHE_TTL <= now:
+            return None
+        row.last_used_at = now
+        db.commit()
+        return row.created_at + ANALYSIS_CACHE_TTL, json.loads(row.result)
+    finally:
+        db.close()
+
+def write_cached_analysis(key: str, result: str, now: datetime, prune: bool) -> int:
+    """Upsert a cache row, optionally evicting expired and least recently used rows (runs in a thread)"""
+    db = SessionLocal()
+    try:
+        db.merge(AnalysisCache(key=key, result=result, created_at=now, last_used_at=now))
+        evicted = 0
+        if prune:
+            db.flush()
+            db.query(AnalysisCache).filter(
+                AnalysisCache.created_at <= now - ANALYSIS_CACHE_TTL
+            ).delete(synchronize_session=False)
+            
+            excess = db.query(AnalysisCache).count() - ANALYSIS_CACHE_MAX
+            if excess > 0:
+                oldest = [k for (k,) in db.query(AnalysisCache.key).order_by(AnalysisCache.last_used_at).limit(excess)]
+                db.query(AnalysisCache).filter(AnalysisCache.key.in_(oldest)).delete(synchronize_session=False)
+                evicted = len(oldest)
+        db.commit()
+        return evicted
+    finally:
+        db.close()
+
+async def get_cached_analysis(key: str) -> Optional[Dict[str, Any]]:
+    """Look up an analysis in memory, then in the database"""
+    now = datetime.utcnow()
+    entry = analysis_cache_memory.get(key)
+    if entry and entry[0] > now:
+        analysis_cache_memory.move_to_end(key)
+        analysis_cache_stats["hits"] += 1
+        return dict(entry[1])
+    
+    # The in-memory tier is only touched here on the event loop; the thread does the database part
+    entry = await asyncio.to_thread(load_cached_analysis_row, key, now)
+    if entry:
+        remember_analysis(key, *entry)
+        analysis_cache_stats["hits"] += 1
+        return dict(entry[1])
+    
+    analysis_cache_stats["misses"] += 1
+    return None
+
+async def store_cached_analysis(key: str, result: Dict[str, Any]):
+    """Save an analysis; every ANALYSIS_CACHE_PRUNE_EVERY writes also evict expired and excess rows"""
+    global analysis_cache_writes
+    now = datetime.utcnow()
+    remember_analysis(key, now + ANALYSIS_CACHE_TTL, result)
+    
+    analysis_cache_writes += 1
+    prune = analysis_cache_writes >= ANALYSIS_CACHE_PRUNE_EVERY
+    if prune:
+        analysis_cache_writes = 0
+    try:
+        analysis_cache_stats["evictions"] += await asyncio.to_thread(
+            write_cached_analysis, key, json.dumps(result), now, prune
+        )
+    except Exception as e:
+        logger.warning(f"Failed to store cached analysis: {e}")
+
+# Local RP screening tier
+# Opt-in: notes with no lexicon hit and no cue word at all are answered locally without an LLM call.
+# Check `python rp_classifier.py` recall against real notes before enabling it.
+RP_SCREEN_ENABLED = os.getenv("RP_SCREEN_ENABLED", "false").lower() == "true"
+rp_screen_stats = {"skipped": 0, "escalated": 0}
+
+# Helper for the single round trip chat completion backend
+async def run_chat_completion(content: str) -> str:
+    """Send the Nova system prompt and a user message, returning the JSON reply"""
+    completion = await async_openai_client.chat.completions.create(
+        model=ASSISTANT_MODEL,
+        messages=[
+            {"role": "system", "content": ASSISTANT_INSTRUCTIONS},
+            {"role": "user", "content": content}
+        ],
+        response_format={
+            "type": "json_schema",
+            "json_schema": {"name": "careiq_response", "strict": True, "schema": ANALYSIS_RESPONSE_SCHEMA}
+        },
+        timeout=OPENAI_RUN_TIMEOUT
+    )
+    return completion.choices[0].message.content
+
+async def ask_model(content: str, keep_thread: bool = True) -> Tuple[Optional[str], str]:
+    """Query the configured OpenAI backend, returning (thread_id or None, reply text)"""
+    if OPENAI_BACKEND == "assistant":
+        return await run_assistant(content, delete_thread=not keep_thread)
+    return None, await run_chat_completion(content)
+
+# Helper function for OpenAI GPT-4 analysis
+async def analyze_with_gpt4(text: str, context: Dict[str, Any] = {}, fallback: bool = True) -> Dict[str, Any]:
+    """Analyze text with GPT-4 using the configured OpenAI backend
+    
+    With fallback=False a model error is raised instead of being answered by the local lexicon,
+    so callers that persist results can retry or mark the note failed.
+    """
+    screen = rp_classifier.classify(text)
+    if RP_SCREEN_ENABLED:
+        if not needs_llm(screen):
+            rp_screen_stats["skipped"] += 1
+            return local_rp_analysis(screen)
+        rp_screen_stats["escalated"] += 1
+    
+    cache_key = analysis_cache_key(text) if ANALYSIS_CACHE_MAX > 0 else None
+    if cache_key:
+        cached = await get_cached_analysis(cache_key)
+        if cached is not None:
+            return cached
+    
+    try:
+        _, response = await ask_model(
+            f"Analyze this note for restrictive practices: {text}",
+            keep_thread=False
         )
-        
-        # Wait for completion
-        while run.status != "completed":
-            run = openai_client.beta.threads.runs.retrieve(
-                thread_id=thread.id,
-                run_id=run.id
-            )
-            if run.status == "failed":
-                raise Exception("Assistant run failed")
-        
-        # Get the response
-        messages = openai_client.beta.threads.messages.list(thread_id=thread.id)
-        response = messages.data[0].content[0].text.value
         
         # Parse JSON response
         result = json.loads(response)
         
         # Ensure all required fields
-        return {
+        analysis = {
             "rp_flag": result.get("rp_flag", False),
             "detected_practices": result.get("detected_practices", []),
             "tags": result.get("tags", []),
@@ -339,25 +1040,25 @@ async def analyze_with_gpt4(text: str, context: Dict[str, Any] = {}) -> Dict[str
             "alternatives": result.get("alternatives", [])
         }
         
+        # Fallback results are never cached, only real assistant answers
+        if cache_key:
+            await store_cached_analysis(cache_key, analysis)
+        return analysis
+        
     except Exception as e:
         logger.error(f"GPT-4 analysis error: {str(e)}")
-        # Fallback to simple keyword detection
-        return check_restrictive_practice_fallback(text)
+        if not fallback:
+            raise
+        # Fallback to local lexicon detection
+        return local_rp_analysis(screen)
 
 def check_restrictive_practice_fallback(text: str) -> Dict[str, Any]:
     """Fallback RP detection when GPT-4 is unavailable"""
-    rp_keywords = [
-        "blocked door", "locked door", "restrained", "tied", "forced",
-        "prevented from leaving", "held down", "chemical restraint",
-        "physical restraint", "locked in", "can't leave", "won't let"
-    ]
-    
-    text_lower = text.lower()
-    detected_practices = []
-    
-    for keyword in rp_keywords:
-        if keyword in text_lower:
-            detected_practices.append(keyword)
+    return local_rp_analysis(rp_classifier.classify(text))
+
+def local_rp_analysis(screen: Dict[str, Any]) -> Dict[str, Any]:
+    """Build an analysis result from the local RP classifier output"""
+    detected_practices = screen["detected_practices"]
     
     if detected_practices:
         return {
@@ -384,6 +1085,350 @@ def check_restrictive_practice_fallback(text: str) -> Dict[str, Any]:
         "severity": "low",
         "alternatives": []
     }
+
+# Materialized dashboard stats
+# Counters are bumped in the same transaction as the write that changes them
+# and recomputed from the source tables every STATS_RECONCILE_SECONDS.
+STATS_RECONCILE_SECONDS = int(os.getenv("STATS_RECONCILE_SECONDS", "600"))
+stats_reconcile_task: Optional[asyncio.Task] = None
+
+STATS_UPSERT = sql_text(
+    "INSERT INTO stats_counters (key, value) VALUES (:key, :delta) "
+    "ON CONFLICT (key) DO UPDATE SET value = stats_counters.value + excluded.value"
+)
+
+def bump_stats(db: Session, **deltas: int):
+    """Add deltas to stats counters inside the caller's transaction"""
+    for key, delta in deltas.items():
+        if delta:
+            db.execute(STATS_UPSERT, {"key": key, "delta": delta})
+
+async def bump_stats_async(db: AsyncSession, **deltas: int):
+    for key, delta in deltas.items():
+        if delta:
+            await db.execute(STATS_UPSERT, {"key": key, "delta": delta})
+
+def user_notes_key(user_id: str) -> str:
+    return f"user_notes:{user_id}"
+
+def reconcile_stats(db: Session):
+    """Recompute every stats counter from the source tables"""
+    counters = {
+        "notes": db.query(func.count(Note.id)).scalar(),
+        "rp_notes": db.query(func.count(Note.id)).filter(Note.rp_flag == True).scalar(),
+        "participants": db.query(func.count(Participant.id)).scalar(),
+    }
+    for user_id, count in db.query(Note.user_id, func.count(Note.id)).group_by(Note.user_id):
+        counters[user_notes_key(user_id)] = count
+    
+    db.query(StatsCounter).delete(synchronize_session=False)
+    db.bulk_insert_mappings(StatsCounter, [{"key": k, "value": v} for k, v in counters.items()])
+    db.commit()
+
+async def reconcile_stats_periodically():
+    while True:
+        await asyncio.sleep(STATS_RECONCILE_SECONDS)
+        try:
+            await asyncio.to_thread(in_session, reconcile_stats)
+        except Exception as e:
+            logger.error(f"Stats reconciliation failed: {e}")
+
+# Background RP analysis queue
+# In "background" mode notes are saved with analysis_status=pending and analyzed
+# by in-process workers. Pending rows are re-queued on startup, so the notes
+# table itself is the durable job store.
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "sync")  # sync/background
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "4"))
+ANALYSIS_RETRIES = int(os.getenv("ANALYSIS_RETRIES", "2"))  # extra attempts before a note is marked failed
+ANALYSIS_RETRY_DELAY = float(os.getenv("ANALYSIS_RETRY_DELAY", "5"))  # seconds, doubled per attempt
+analysis_queue: Optional[asyncio.Queue] = None
+analysis_worker_tasks: List[asyncio.Task] = []
+
+def background_analysis_enabled() -> bool:
+    return ANALYSIS_MODE == "background" and analysis_queue is not None
+
+async def enqueue_analysis(note_id: str):
+    """Queue a pending note for background analysis"""
+    await analysis_queue.put(note_id)
+
+def pending_note_text(db: Session, note_id: str) -> Optional[str]:
+    note = db.query(Note).filter(Note.id == note_id).first()
+    return note.text if note and note.analysis_status == "pending" else None
+
+def store_note_analysis(db: Session, note_id: str, analysis: Optional[Dict[str, Any]]) -> Optional[Note]:
+    """Write a background analysis back (None marks the note failed); returns the detached note"""
+    note = db.query(Note).filter(Note.id == note_id).first()
+    if not note or note.analysis_status != "pending":
+        return None
+    if analysis is not None:
+        bump_stats(db, rp_notes=int(bool(analysis["rp_flag"])) - int(bool(note.rp_flag)))
+        apply_analysis(note, analysis)
+        note.analysis_status = "complete"
+    else:
+        note.analysis_status = "failed"
+    db.commit()
+    db.refresh(note)
+    db.expunge(note)
+    return note
+
+async def process_note_analysis(note_id: str):
+    """Analyze a pending note and write the result back"""
+    text = await asyncio.to_thread(in_session, pending_note_text, note_id)
+    if text is None:
+        return
+    # Model errors are retried, never answered by the lexicon fallback
+    analysis = None
+    for attempt in range(ANALYSIS_RETRIES + 1):
+        try:
+            analysis = await analyze_with_gpt4(text, fallback=False)
+            break
+        except Exception as e:
+            logger.error(f"Background analysis error for note {note_id} (attempt {attempt + 1}): {e}")
+            if attempt < ANALYSIS_RETRIES:
+                await asyncio.sleep(ANALYSIS_RETRY_DELAY * 2 ** attempt)
+    note = await asyncio.to_thread(in_session, store_note_analysis, note_id, analysis)
+    if note and note.rp_flag:
+        record_rp_note(note.user_id, note.timestamp)
+
+async def analysis_worker(worker_id: int):
+    while True:
+        note_id = await analysis_queue.get()
+        try:
+            await process_note_analysis(note_id)
+        except Exception as e:
+            logger.error(f"Analysis worker {worker_id} error: {e}")
+        finally:
+            analysis_queue.task_done()
+
+def start_analysis_workers():
+    """Start the worker pool and re-queue notes left pending by a previous process"""
+    global analysis_queue
+    if ANALYSIS_MODE != "background":
+        return
+    analysis_queue = asyncio.Queue()
+    for i in range(ANALYSIS_WORKERS):
+        analysis_worker_tasks.append(asyncio.create_task(analysis_worker(i)))
+    analysis_worker_tasks.append(asyncio.create_task(requeue_pending_notes()))
+
+async def requeue_pending_notes():
+    try:
+        await database_provider.get()
+        pending = await asyncio.to_thread(
+            in_session, lambda db: db.query(Note.id).filter(Note.analysis_status == "pending").all()
+        )
+    except Exception as e:
+        logger.error(f"Failed to re-queue pending notes: {e}")
+        return
+    for (note_id,) in pending:
+        await analysis_queue.put(note_id)
+    logger.info(f"Started {ANALYSIS_WORKERS} analysis workers ({len(pending)} pending notes re-queued)")
+
+async def stop_analysis_workers():
+    for task in analysis_worker_tasks:
+        task.cancel()
+    await asyncio.gather(*analysis_worker_tasks, return_exceptions=True)
+    analysis_worker_tasks.clear()
+
+def sync_note_index():
+    """Open the embedding index and embed any notes it does not have yet"""
+    note_index.open()
+    db = SessionLocal()
+    added = 0
+    try:
+        batch = []
+        query = db.query(Note.id, Note.participant_id, Note.text).order_by(Note.timestamp)
+        for row in query.execution_options(stream_results=True).yield_per(NOTE_INDEX_BATCH):
+            if row.id not in note_index:
+                batch.append((row.id, row.participant_id, row.text))
+            if len(batch) >= NOTE_INDEX_BATCH:
+                added += note_index.add(batch)
+                batch = []
+        added += note_index.add(batch)
+    finally:
+        db.close()
+    logger.info(f"Note index synced: {added} notes embedded, {len(note_index)} total")
+
+async def index_note(note: Note):
+    """Add a new note to the similarity index without blocking the event loop"""
+    if not note_index.ready:
+        return  # picked up by sync_note_index once the index is open
+    try:
+        await asyncio.to_thread(note_index.add, [(note.id, note.participant_id, note.text)])
+    except Exception as e:
+        logger.warning(f"Failed to index note {note.id}: {e}")
+
+async def save_note(db: AsyncSession, participant_id: str, user_id: str, text: str, audio_duration: Optional[int] = None) -> Note:
+    """Create a note, analyzing it inline or queueing it for background analysis"""
+    if background_analysis_enabled():
+        # Save now, analyze in the background
+        note = Note(
+            participant_id=participant_id,
+            user_id=user_id,
+            text=text,
+            rp_flag=False,
+            analysis_status="pending",
+            audio_duration=audio_duration
+        )
+    else:
+        # Analyze with GPT-4
+        analysis = await analyze_with_gpt4(text)
+        
+        note = Note(
+            participant_id=participant_id,
+            user_id=user_id,
+            text=text,
+            audio_duration=audio_duration
+        )
+        apply_analysis(note, analysis)
+    
+    db.add(note)
+    await bump_stats_async(db, notes=1, rp_notes=int(bool(note.rp_flag)), **{user_notes_key(user_id): 1})
+    await db.commit()
+    await db.refresh(note)
+    
+    if note.analysis_status == "pending":
+        await enqueue_analysis(note.id)
+    elif note.rp_flag:
+        record_rp_note(user_id, note.timestamp)
+    
+    await index_note(note)
+    return note
+
+# Bulk re-analysis of historical notes
+# Notes are read in (timestamp, id) keyset order, analyzed with bounded concurrency,
+# and each batch is written back in one transaction together with the job checkpoint,
+# so an interrupted job resumes from the last committed batch.
+reanalysis_tasks: Dict[str, asyncio.Task] = {}
+
+def parse_iso_date(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+
+def begin_reanalysis(db: Session, job_id: str) -> ReanalysisJob:
+    job = db.query(ReanalysisJob).filter(ReanalysisJob.id == job_id).first()
+    if not job:
+        raise ValueError(f"Reanalysis job {job_id} not found")
+    job.status = "running"
+    job.error = None
+    db.commit()
+    db.refresh(job)
+    db.expunge(job)
+    return job
+
+def next_reanalysis_batch(db: Session, job: ReanalysisJob) -> list:
+    """The next batch of notes after the job's checkpoint"""
+    query = db.query(Note.id, Note.text, Note.timestamp, Note.rp_flag)
+    if job.participant_id:
+        query = query.filter(Note.participant_id == job.participant_id)
+    if job.start_date:
+        query = query.filter(Note.timestamp >= job.start_date)
+    if job.end_date:
+        query = query.filter(Note.timestamp <= job.end_date)
+    if job.cursor_timestamp is not None:
+        # Row value so each batch seeks to the checkpoint rather than rereading every note before it
+        query = query.filter(tuple_(Note.timestamp, Note.id) > (job.cursor_timestamp, job.cursor_note_id))
+    return query.order_by(Note.timestamp, Note.id).limit(job.batch_size).all()
+
+def commit_reanalysis_batch(db: Session, job_id: str, batch: list, analyses: List[Dict[str, Any]]) -> ReanalysisJob:
+    """Write a batch of analyses and move the checkpoint in one transaction"""
+    job = db.query(ReanalysisJob).filter(ReanalysisJob.id == job_id).first()
+    db.bulk_update_mappings(Note, [
+        {
+            "id": row.id,
+            "rp_flag": analysis["rp_flag"],
+            "gpt_response": json.dumps(analysis),
+            "analysis_status": "complete",
+            **analysis_columns(analysis)
+        }
+        for row, analysis in zip(batch, analyses)
+    ])
+    replace_note_practices(db, {row.id: analysis for row, analysis in zip(batch, analyses)})
+    job.cursor_timestamp = batch[-1].timestamp
+    job.cursor_note_id = batch[-1].id
+    job.processed += len(batch)
+    job.flagged += sum(1 for a in analyses if a["rp_flag"])
+    job.changed += sum(1 for row, a in zip(batch, analyses) if bool(row.rp_flag) != bool(a["rp_flag"]))
+    job.updated_at = datetime.utcnow()
+    bump_stats(db, rp_notes=sum(int(bool(a["rp_flag"])) - int(bool(row.rp_flag)) for row, a in zip(batch, analyses)))
+    db.commit()
+    db.refresh(job)
+    db.expunge(job)
+    return job
+
+def finish_reanalysis(db: Session, job_id: str, status: str, error: Optional[str] = None):
+    job = db.query(ReanalysisJob).filter(ReanalysisJob.id == job_id).first()
+    if job:
+        job.status = status
+        job.error = error
+        job.updated_at = datetime.utcnow()
+        db.commit()
+
+async def run_reanalysis(job_id: str):
+    """Re-score every note matching a job's filters, resuming from its checkpoint"""
+    try:
+        job = await asyncio.to_thread(in_session, begin_reanalysis, job_id)
+        
+        semaphore = asyncio.Semaphore(max(1, job.concurrency))
+        
+        async def analyze_bounded(text: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await analyze_with_gpt4(text, fallback=False)
+        
+        async def analyze_batch(texts: List[str]) -> List[Dict[str, Any]]:
+            """Analyze every text, retrying failures; raises rather than keep lexicon fallbacks"""
+            analyses: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+            todo = list(range(len(texts)))
+            for attempt in range(ANALYSIS_RETRIES + 1):
+                outcomes = await asyncio.gather(*[analyze_bounded(texts[i]) for i in todo], return_exceptions=True)
+                errors = [(i, o) for i, o in zip(todo, outcomes) if isinstance(o, BaseException)]
+                for i, outcome in zip(todo, outcomes):
+                    if not isinstance(outcome, BaseException):
+                        analyses[i] = outcome
+                if not errors:
+                    return analyses
+                todo = [i for i, _ in errors]
+                logger.warning(f"Reanalysis {job_id}: {len(todo)} notes failed (attempt {attempt + 1}): {errors[0][1]}")
+                if attempt < ANALYSIS_RETRIES:
+                    await asyncio.sleep(ANALYSIS_RETRY_DELAY * 2 ** attempt)
+            raise RuntimeError(f"{len(todo)} notes failed analysis after {ANALYSIS_RETRIES + 1} attempts: {errors[0][1]}")
+        
+        while True:
+            batch = await asyncio.to_thread(in_session, next_reanalysis_batch, job)
+            if not batch:
+                break
+            
+            # A model outage fails the job before this batch is written, so the checkpoint stays put
+            analyses = await analyze_batch([row.text for row in batch])
+            job = await asyncio.to_thread(in_session, commit_reanalysis_batch, job_id, batch, analyses)
+            logger.info(f"Reanalysis {job.id}: {job.processed} notes processed")
+        
+        await asyncio.to_thread(in_session, finish_reanalysis, job_id, "complete")
+        
+        # Flags may have flipped either way, so recount from the database
+        await rebuild_activity_counters()
+    except Exception as e:
+        logger.error(f"Reanalysis {job_id} failed: {e}")
+        await asyncio.to_thread(in_session, finish_reanalysis, job_id, "failed", str(e))
+    finally:
+        reanalysis_tasks.pop(job_id, None)
+
+def reanalysis_job_response(job: ReanalysisJob) -> ReanalysisJobResponse:
+    return ReanalysisJobResponse(
+        id=job.id,
+        status=job.status,
+        participant_id=job.participant_id,
+        start_date=job.start_date,
+        end_date=job.end_date,
+        processed=job.processed,
+        flagged=job.flagged,
+        changed=job.changed,
+        cursor_timestamp=job.cursor_timestamp,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at
+    )
+
 # Add this around line 350 (after existing helper functions)
 TRAINING_MODULES = {
     "rp-alternatives": {
@@ -608,74 +1653,130 @@ Restrictive practices are interventions that intentionally restrict a person's r
     }
 }
 
-def get_recommended_modules(user_id: str, db: Session) -> List[str]:
-    """Get recommended training modules based on user's recent activity"""
-    twenty_four_hours_ago = datetime.utcnow() - timedelta(hours=24)
-    
-    # Get recent RP incidents
-    rp_notes = db.query(Note).filter(
-        and_(
-            Note.user_id == user_id,
-            Note.timestamp >= twenty_four_hours_ago,
-            Note.rp_flag == True
-        )
-    ).all()
-    
-    # Get recent queries
-    queries = db.query(QueryLog).filter(
-        and_(
-            QueryLog.user_id == user_id,
-            QueryLog.timestamp >= twenty_four_hours_ago
-        )
+# Rolling 24h activity counters for training triggers
+# Each user has one ring of per-minute buckets for RP-flagged notes and one for
+# Nova queries. Counters are rebuilt from the database on startup and updated
+# on every write, so trigger checks never touch the database. They are per
+# process: with several uvicorn workers each one counts the writes it handled
+# plus whatever was in the database when it started.
+TRAINING_WINDOW_MINUTES = 24 * 60
+EPOCH = datetime(1970, 1, 1)
+
+class RollingCounter:
+    """Event count over a sliding window of per-minute buckets"""
+    
+    def __init__(self, window_minutes: int = TRAINING_WINDOW_MINUTES):
+        self.size = window_minutes
+        self.buckets = [0] * window_minutes
+        self.head = None  # newest minute seen
+        self.total = 0
+    
+    @staticmethod
+    def minute_of(when: datetime) -> int:
+        return int((when - EPOCH).total_seconds() // 60)
+    
+    def _advance(self, minute: int):
+        if self.head is None:
+            self.head = minute
+            return
+        if minute <= self.head:
+            return
+        # Clear buckets that fell out of the window (at most one full lap)
+        for m in range(max(self.head + 1, minute - self.size + 1), minute + 1):
+            i = m % self.size
+            self.total -= self.buckets[i]
+            self.buckets[i] = 0
+        self.head = minute
+    
+    def add(self, when: datetime, n: int = 1):
+        minute = self.minute_of(when)
+        self._advance(minute)
+        if minute <= self.head - self.size:
+            return  # older than the window
+        self.buckets[minute % self.size] += n
+        self.total += n
+    
+    def count(self, now: Optional[datetime] = None) -> int:
+        self._advance(self.minute_of(now or datetime.utcnow()))
+        return self.total
+
+rp_note_counters: Dict[str, RollingCounter] = {}
+query_counters: Dict[str, RollingCounter] = {}
+
+def record_rp_note(user_id: str, when: Optional[datetime] = None):
+    rp_note_counters.setdefault(user_id, RollingCounter()).add(when or datetime.utcnow())
+
+def record_query(user_id: str, when: Optional[datetime] = None):
+    query_counters.setdefault(user_id, RollingCounter()).add(when or datetime.utcnow())
+
+def get_activity_counts(user_id: str) -> Tuple[int, int]:
+    """RP-flagged notes and Nova queries for a user in the last 24 hours"""
+    rp_counter = rp_note_counters.get(user_id)
+    query_counter = query_counters.get(user_id)
+    return (
+        rp_counter.count() if rp_counter else 0,
+        query_counter.count() if query_counter else 0
+    )
+
+def load_recent_activity(db: Session) -> Tuple[list, list]:
+    """(user_id, timestamp) of RP notes and of queries in the last 24 hours"""
+    since = datetime.utcnow() - timedelta(minutes=TRAINING_WINDOW_MINUTES)
+    rp_notes = db.query(Note.user_id, Note.timestamp).filter(
+        and_(Note.timestamp >= since, Note.rp_flag == True)
     ).all()
+    queries = db.query(QueryLog.user_id, QueryLog.timestamp).filter(QueryLog.timestamp >= since).all()
+    return rp_notes, queries
+
+async def load_activity():
+    """Counters and stats scan the notes table, so they load in the background once the schema is ready"""
+    await database_provider.get()
+    await rebuild_activity_counters()
+    await asyncio.to_thread(in_session, reconcile_stats)
+
+async def rebuild_activity_counters():
+    """Load the last 24 hours of RP notes and queries into the counters"""
+    # Query in a thread, but only touch the counters on the event loop
+    rp_notes, queries = await asyncio.to_thread(in_session, load_recent_activity)
+    rp_note_counters.clear()
+    query_counters.clear()
+    for user_id, timestamp in rp_notes:
+        record_rp_note(user_id, timestamp)
+    for user_id, timestamp in queries:
+        record_query(user_id, timestamp)
+
+def get_recommended_modules(user_id: str) -> List[str]:
+    """Get recommended training modules based on user's recent activity"""
+    rp_notes, queries = get_activity_counts(user_id)
     
     recommended = []
     
     # If multiple RP incidents, recommend alternatives training
-    if len(rp_notes) >= 2:
+    if rp_notes >= 2:
         recommended.append("rp-alternatives")
     
     # If many queries, recommend de-escalation
-    if len(queries) >= 3:
+    if queries >= 3:
         recommended.append("de-escalation")
     
     # Always include PBSP basics for comprehensive understanding
-    if len(rp_notes) + len(queries) >= 2:
+    if rp_notes + queries >= 2:
         recommended.append("pbsp-basics")
     
     return recommended[:2]  # Limit to 2 recommendations
 
-def has_completed_training(user_id: str, module_id: str, db: Session) -> bool:
+async def has_completed_training(user_id: str, module_id: str, db: AsyncSession) -> bool:
     """Check if user has completed specific training module"""
-    completion = db.query(TrainingCompletion).filter(
+    completion = (await db.execute(select(TrainingCompletion.id).filter(
         and_(
             TrainingCompletion.user_id == user_id,
             TrainingCompletion.module_id == module_id
         )
-    ).first()
+    ))).first()
     return completion is not None
 # Check for micro-training triggers
-async def check_training_triggers(user_id: str, db: Session) -> bool:
+async def check_training_triggers(user_id: str) -> bool:
     """Check if user needs training prompt (2+ RP flags or queries in 24hrs)"""
-    twenty_four_hours_ago = datetime.utcnow() - timedelta(hours=24)
-    
-    # Count RP-flagged notes
-    rp_notes_count = db.query(Note).filter(
-        and_(
-            Note.user_id == user_id,
-            Note.timestamp >= twenty_four_hours_ago,
-            Note.rp_flag == True
-        )
-    ).count()
-    
-    # Count queries
-    queries_count = db.query(QueryLog).filter(
-        and_(
-            QueryLog.user_id == user_id,
-            QueryLog.timestamp >= twenty_four_hours_ago
-        )
-    ).count()
-    
+    rp_notes_count, queries_count = get_activity_counts(user_id)
     return (rp_notes_count + queries_count) >= 2
 
 # Initialize sample data
@@ -694,118 +1795,296 @@ def init_sample_data(db: Session):
         logger.info("Sample participants created")
 
 # API Endpoints
-# Add these imports at the top of app.py if not already present:
-from fastapi.responses import Response
-import csv
-import io
-
 # Add this endpoint to your existing app.py file:
 
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "500"))
+
+def note_practices_column():
+    """A note's practices as one comma-separated string, aggregated in SQL"""
+    if engine.dialect.name == "postgresql":
+        aggregate = func.string_agg(NotePractice.practice, ", ")
+    else:
+        aggregate = func.group_concat(NotePractice.practice, ", ")
+    return select(aggregate).where(NotePractice.note_id == Note.id).scalar_subquery()
+
+def iter_export_rows(participant_id: Optional[str], start_dt: Optional[datetime], end_dt: Optional[datetime]):
+    """Yield export rows in chunks from a server-side cursor, names joined in the same query"""
+    db = SessionLocal()
+    try:
+        query = db.query(
+            Note.id, Note.timestamp, Note.participant_id, Note.user_id, Note.text,
+            Note.rp_flag, Note.gpt_response, Note.audio_duration, Note.severity, Note.intent,
+            note_practices_column().label("practices"),
+            Participant.name.label("participant_name"),
+            User.name.label("user_name")
+        ).outerjoin(Participant, Participant.id == Note.participant_id).outerjoin(User, User.id == Note.user_id)
+        
+        if participant_id:
+            query = query.filter(Note.participant_id == participant_id)
+        if start_dt:
+            query = query.filter(Note.timestamp >= start_dt)
+        if end_dt:
+            query = query.filter(Note.timestamp <= end_dt)
+        
+        query = query.order_by(desc(Note.timestamp)).execution_options(stream_results=True)
+        for row in query.yield_per(EXPORT_CHUNK_SIZE):
+            yield row
+    finally:
+        db.close()
+
+def export_csv_chunks(rows):
+    output = io.StringIO()
+    writer = csv.writer(output)
+    
+    # Headers
+    writer.writerow([
+        'Timestamp', 'Staff', 'Participant', 'Note', 
+        'RP Flag', 'RP Type', 'Duration (s)'
+    ])
+    
+    # Data
+    for i, note in enumerate(rows, 1):
+        rp_type = (note.practices or '') if note.rp_flag else ''
+        
+        writer.writerow([
+            note.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+            note.user_name or 'Unknown',
+            note.participant_name or 'Unknown',
+            note.text,
+            'Yes' if note.rp_flag else 'No',
+            rp_type,
+            note.audio_duration or ''
+        ])
+        
+        if i % EXPORT_CHUNK_SIZE == 0:
+            yield output.getvalue()
+            output.seek(0)
+            output.truncate(0)
+    
+    yield output.getvalue()
+
+def export_note_dict(note) -> Dict[str, Any]:
+    return {
+        'id': note.id,
+        'timestamp': note.timestamp.isoformat(),
+        'participant': note.participant_name or 'Unknown',
+        'participant_id': note.participant_id,
+        'staff': note.user_name or 'Unknown',
+        'staff_id': note.user_id,
+        'text': note.text,
+        'rp_flag': note.rp_flag,
+        'rp_details': json.loads(note.gpt_response) if note.gpt_response else None,
+        'audio_duration': note.audio_duration
+    }
+
+def export_json_chunks(rows, filters: Dict[str, Any]):
+    # Same document as before, written incrementally; total_notes follows the notes array
+    yield '{"export_date": %s, "filters": %s, "notes": [' % (
+        json.dumps(datetime.utcnow().isoformat()), json.dumps(filters)
+    )
+    buffer = []
+    total = 0
+    for note in rows:
+        buffer.append(('' if total == 0 else ',') + json.dumps(export_note_dict(note)))
+        total += 1
+        if len(buffer) >= EXPORT_CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+    yield ''.join(buffer) + '], "total_notes": %d}' % total
+
+def export_ndjson_chunks(rows):
+    buffer = []
+    for note in rows:
+        buffer.append(json.dumps(export_note_dict(note)) + '\n')
+        if len(buffer) >= EXPORT_CHUNK_SIZE:
+            yield ''.join(buffer)
+            buffer = []
+    yield ''.join(buffer)
+
+# Columnar exports flatten the RP analysis into typed columns
+EXPORT_ARROW_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("timestamp", pa.timestamp("us")),
+    ("participant_id", pa.string()),
+    ("participant", pa.string()),
+    ("staff_id", pa.string()),
+    ("staff", pa.string()),
+    ("text", pa.string()),
+    ("rp_flag", pa.bool_()),
+    ("severity", pa.string()),
+    ("intent", pa.string()),
+    ("detected_practices", pa.list_(pa.string())),
+    ("tags", pa.list_(pa.string())),
+    ("alternatives", pa.list_(pa.string())),
+    ("response", pa.string()),
+    ("audio_duration", pa.int32()),
+]) if pa else None
+
+class ExportSink:
+    """Write-only file object whose contents are drained as the writer produces them"""
+    
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+        self.closed = False
+    
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+    
+    def tell(self) -> int:
+        return self.position
+    
+    def flush(self):
+        pass
+    
+    def close(self):
+        self.closed = True
+    
+    def writable(self) -> bool:
+        return True
+    
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+def export_record_batches(rows):
+    """Group export rows into Arrow record batches of EXPORT_CHUNK_SIZE"""
+    columns = {name: [] for name in EXPORT_ARROW_SCHEMA.names}
+    
+    def flush():
+        batch = pa.RecordBatch.from_pydict(columns, schema=EXPORT_ARROW_SCHEMA)
+        for values in columns.values():
+            values.clear()
+        return batch
+    
+    for note in rows:
+        details = json.loads(note.gpt_response) if note.gpt_response else {}
+        columns["id"].append(note.id)
+        columns["timestamp"].append(note.timestamp)
+        columns["participant_id"].append(note.participant_id)
+        columns["participant"].append(note.participant_name)
+        columns["staff_id"].append(note.user_id)
+        columns["staff"].append(note.user_name)
+        columns["text"].append(note.text)
+        columns["rp_flag"].append(bool(note.rp_flag))
+        columns["severity"].append(note.severity)
+        columns["intent"].append(note.intent)
+        columns["detected_practices"].append(details.get("detected_practices", []))
+        columns["tags"].append(details.get("tags", []))
+        columns["alternatives"].append(details.get("alternatives", []))
+        columns["response"].append(details.get("response"))
+        columns["audio_duration"].append(note.audio_duration)
+        if len(columns["id"]) >= EXPORT_CHUNK_SIZE:
+            yield flush()
+    
+    if columns["id"]:
+        yield flush()
+
+def export_parquet_chunks(rows):
+    # One row group per batch, bytes yielded as soon as each group is written
+    sink = ExportSink()
+    writer = pq.ParquetWriter(sink, EXPORT_ARROW_SCHEMA, compression="zstd")
+    for batch in export_record_batches(rows):
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+def export_arrow_chunks(rows):
+    # Arrow IPC stream format, readable with pyarrow.ipc.open_stream
+    sink = ExportSink()
+    writer = pa.ipc.new_stream(sink, EXPORT_ARROW_SCHEMA)
+    for batch in export_record_batches(rows):
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
 @app.get("/api/export/{format}")
 async def export_data(
     format: str,
     participant_id: Optional[str] = None,
     start_date: Optional[str] = None,
     end_date: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user)
 ):
-    """Export notes in CSV or JSON format"""
-    if format not in ['csv', 'json']:
-        raise HTTPException(status_code=400, detail="Format must be 'csv' or 'json'")
-    
-    # Build query
-    query = db.query(Note)
-    
-    if participant_id:
-        query = query.filter(Note.participant_id == participant_id)
+    """Export notes in CSV, JSON, NDJSON, Parquet or Arrow format, streamed in chunks"""
+    if format not in ['csv', 'json', 'ndjson', 'parquet', 'arrow']:
+        raise HTTPException(status_code=400, detail="Format must be 'csv', 'json', 'ndjson', 'parquet' or 'arrow'")
+    if format in ['parquet', 'arrow'] and pa is None:
+        raise HTTPException(status_code=501, detail="Columnar exports require pyarrow to be installed")
     
+    start_dt = None
     if start_date:
         try:
             start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-            query = query.filter(Note.timestamp >= start_dt)
         except:
             pass
     
+    end_dt = None
     if end_date:
         try:
             end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-            query = query.filter(Note.timestamp <= end_dt)
         except:
             pass
     
-    notes = query.order_by(desc(Note.timestamp)).all()
+    rows = iter_export_rows(participant_id, start_dt, end_dt)
+    filename = f'careiq_export_{datetime.utcnow().strftime("%Y%m%d_%H%M%S")}'
     
     if format == 'json':
-        # JSON export
-        export_data = []
-        for note in notes:
-            export_data.append({
-                'id': note.id,
-                'timestamp': note.timestamp.isoformat(),
-                'participant': note.participant.name if note.participant else 'Unknown',
-                'participant_id': note.participant_id,
-                'staff': note.user.name if note.user else 'Unknown',
-                'staff_id': note.user_id,
-                'text': note.text,
-                'rp_flag': note.rp_flag,
-                'rp_details': json.loads(note.gpt_response) if note.gpt_response else None,
-                'audio_duration': note.audio_duration
-            })
-        
-        return JSONResponse(content={
-            'export_date': datetime.utcnow().isoformat(),
-            'total_notes': len(export_data),
-            'filters': {
-                'participant_id': participant_id,
-                'start_date': start_date,
-                'end_date': end_date
-            },
-            'notes': export_data
-        })
+        filters = {
+            'participant_id': participant_id,
+            'start_date': start_date,
+            'end_date': end_date
+        }
+        return StreamingResponse(export_json_chunks(rows, filters), media_type='application/json')
     
-    else:
-        # CSV export
-        output = io.StringIO()
-        writer = csv.writer(output)
-        
-        # Headers
-        writer.writerow([
-            'Timestamp', 'Staff', 'Participant', 'Note', 
-            'RP Flag', 'RP Type', 'Duration (s)'
-        ])
-        
-        # Data
-        for note in notes:
-            rp_details = json.loads(note.gpt_response) if note.gpt_response else {}
-            rp_type = ', '.join(rp_details.get('detected_practices', [])) if note.rp_flag else ''
-            
-            writer.writerow([
-                note.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                note.user.name if note.user else 'Unknown',
-                note.participant.name if note.participant else 'Unknown',
-                note.text,
-                'Yes' if note.rp_flag else 'No',
-                rp_type,
-                note.audio_duration or ''
-            ])
-        
-        output.seek(0)
-        return Response(
-            content=output.getvalue(),
-            media_type='text/csv',
-            headers={
-                'Content-Disposition': f'attachment; filename=careiq_export_{datetime.utcnow().strftime("%Y%m%d_%H%M%S")}.csv'
-            }
+    if format == 'parquet':
+        return StreamingResponse(
+            export_parquet_chunks(rows),
+            media_type='application/vnd.apache.parquet',
+            headers={'Content-Disposition': f'attachment; filename={filename}.parquet'}
+        )
+    
+    if format == 'arrow':
+        return StreamingResponse(
+            export_arrow_chunks(rows),
+            media_type='application/vnd.apache.arrow.stream',
+            headers={'Content-Disposition': f'attachment; filename={filename}.arrows'}
         )
+    
+    if format == 'ndjson':
+        return StreamingResponse(
+            export_ndjson_chunks(rows),
+            media_type='application/x-ndjson',
+            headers={'Content-Disposition': f'attachment; filename={filename}.ndjson'}
+        )
+    
+    return StreamingResponse(
+        export_csv_chunks(rows),
+        media_type='text/csv',
+        headers={'Content-Disposition': f'attachment; filename={filename}.csv'}
+    )
 @app.on_event("startup")
 async def startup_event():
-    """Initialize sample data on startup"""
-    db = SessionLocal()
-    try:
-        init_sample_data(db)
-    finally:
-        db.close()
+    """Start background work; schema setup, sample data and models load after the server is up"""
+    global stats_reconcile_task
+    stats_reconcile_task = asyncio.create_task(reconcile_stats_periodically())
+    start_analysis_workers()
+    # Slow providers load in the background so requests are served right away
+    logger.info(f"Loading Whisper model: {whisper_model_name}")
+    for provider in providers.values():
+        provider.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if stats_reconcile_task:
+        stats_reconcile_task.cancel()
+    await stop_analysis_workers()
+    transcription_pool.shutdown()
 
 @app.get("/")
 async def root():
@@ -820,11 +2099,77 @@ async def health_check():
     return {
         "status": "healthy",
         "timestamp": datetime.utcnow().isoformat(),
-        "firebase": "enabled",
+        "firebase": firebase_provider.state,
         "whisper_model": whisper_model_name,
         "openai": "enabled" if OPENAI_API_KEY else "disabled"
     }
 
+@app.get("/api/ready")
+async def readiness_check(response: Response):
+    """Readiness probe: 200 once every required provider has loaded, 503 before"""
+    ready = all(provider.ready for provider in providers.values() if provider.required)
+    if not ready:
+        response.status_code = 503
+    return {
+        "ready": ready,
+        "providers": {name: provider.status() for name, provider in providers.items()},
+    }
+
+@app.get("/api/metrics/analysis-cache")
+async def analysis_cache_metrics():
+    """RP analysis cache hit/miss counters"""
+    lookups = analysis_cache_stats["hits"] + analysis_cache_stats["misses"]
+    return {
+        **analysis_cache_stats,
+        "hit_rate": round(analysis_cache_stats["hits"] / lookups, 3) if lookups else 0.0,
+        "memory_entries": len(analysis_cache_memory),
+        "max_entries": ANALYSIS_CACHE_MAX,
+        "ttl_seconds": int(ANALYSIS_CACHE_TTL.total_seconds()),
+        "prompt_version": ANALYSIS_PROMPT_VERSION
+    }
+
+@app.get("/api/metrics/rp-screen")
+async def rp_screen_metrics():
+    """How many analyses the local screening tier answered without the LLM"""
+    screened = rp_screen_stats["skipped"] + rp_screen_stats["escalated"]
+    return {
+        **rp_screen_stats,
+        "enabled": RP_SCREEN_ENABLED,
+        "skip_rate": round(rp_screen_stats["skipped"] / screened, 3) if screened else 0.0
+    }
+
+@app.get("/api/metrics/transcription")
+async def transcription_metrics():
+    """Whisper pool queue depth and per-job timings, and how much audio silence trimming removed"""
+    total = audio_trim_stats["audio_seconds_total"]
+    return {
+        **transcription_pool.stats(),
+        **audio_trim_stats,
+        "trimmed_fraction": round(1 - audio_trim_stats["speech_seconds_total"] / total, 3) if total else 0.0,
+    }
+
+@app.get("/api/metrics/auth-cache")
+async def auth_cache_metrics():
+    """Token and user cache hit rates and the signing key set"""
+    return {
+        "tokens": token_cache.summary(),
+        "users": {**user_cache.summary(), "ttl_seconds": AUTH_USER_CACHE_TTL},
+        "keys": firebase_verifier.keys.summary() if firebase_verifier else None,
+    }
+
+@app.get("/api/metrics/db-pool")
+async def db_pool_metrics():
+    """Connection pool usage for the request (async) and background (sync) engines"""
+    return {
+        "async": pool_stats(async_engine.sync_engine),
+        "sync": pool_stats(engine),
+    }
+
+@app.get("/api/metrics/note-index")
+async def note_index_metrics():
+    """Similarity index size and embedding model"""
+    return note_index.stats()
+
 @app.post("/api/auth/verify", response_model=UserResponse)
 async def verify_user(
     current_user: User = Depends(get_current_user)
@@ -839,124 +2184,235 @@ async def verify_user(
         created_at=current_user.created_at
     )
 
-@app.post("/api/voice-to-text", response_model=VoiceTranscriptionResponse)
+@app.post("/api/voice-to-text", response_model=VoiceTranscriptionResponse, openapi_extra=VOICE_UPLOAD_OPENAPI)
 async def voice_to_text(
-    audio: UploadFile = File(...),
-    participant_id: str = Form(...),
+    request: Request,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Voice to text endpoint with RP detection"""
     try:
+        # The model loads after startup; ask the client to retry instead of queueing behind it
+        if not whisper_provider.ready:
+            whisper_provider.start()  # retries a failed load
+            raise HTTPException(
+                status_code=503,
+                detail="Transcription model loading, please retry",
+                headers={"Retry-After": str(WHISPER_RETRY_AFTER)}
+            )
+        
+        # Parsed here rather than by FastAPI so oversized uploads are refused before the body is read
+        participant_id, audio_data = await read_voice_upload(request)
+        
         # Validate participant
-        participant = db.query(Participant).filter(Participant.id == participant_id).first()
+        participant = await db.get(Participant, participant_id)
         if not participant:
             raise HTTPException(status_code=404, detail="Participant not found")
         
-        # Read audio data
-        audio_data = await audio.read()
-        
-        # Save audio temporarily with proper extension
-        file_extension = ".wav"
-        if audio.filename:
-            file_extension = os.path.splitext(audio.filename)[1] or ".wav"
+        # Decode once to 16 kHz mono in memory and cut the silence Whisper would otherwise chew through
+        try:
+            prepared = await prepare_audio(audio_data, max_seconds=AUDIO_MAX_SECONDS)
+        except AudioDecodeError as e:
+            logger.warning(f"Could not decode uploaded audio: {e}")
+            raise HTTPException(status_code=400, detail="Could not decode audio")
+        except AudioTooLong as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        del audio_data
+        audio_duration = max(1, round(prepared.duration))
+        record_audio_trim(prepared.duration, prepared.speech_duration, prepared.peak_bytes)
         
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp_file:
-            tmp_file.write(audio_data)
-            tmp_path = tmp_file.name
+        if len(prepared.samples) == 0:
+            raise HTTPException(status_code=400, detail="No speech detected")
         
+        # Transcribe audio in the worker pool
         try:
-            # Transcribe audio
-            if whisper_model:
-                try:
-                    result = whisper_model.transcribe(tmp_path)
-                    transcribed_text = result["text"].strip()
-                except Exception as e:
-                    logger.error(f"Whisper transcription error: {e}")
-                    # Fallback transcription for demo
-                    transcribed_text = "This is a demo transcription. The participant completed their daily activities without any issues."
-            else:
-                # Mock transcription for testing
-                transcribed_text = "This is a demo transcription. The participant completed their daily activities without any issues."
-            
-            # Estimate duration (rough calculation)
-            audio_duration = max(1, len(audio_data) // 16000)  # Approximate for 16kHz audio
-            
-            if not transcribed_text:
-                raise HTTPException(status_code=400, detail="No speech detected")
-            
-            # Analyze with GPT-4
-            analysis = await analyze_with_gpt4(transcribed_text)
-            
-            # Create note
-            note = Note(
-                participant_id=participant_id,
-                user_id=current_user.id,
-                text=transcribed_text,
-                rp_flag=analysis["rp_flag"],
-                gpt_response=json.dumps(analysis),
-                audio_duration=audio_duration
+            transcribed_text = await transcription_pool.transcribe(prepared.samples)
+        except TranscriptionQueueFull as e:
+            logger.warning(f"Transcription queue full: {e}")
+            raise HTTPException(
+                status_code=503,
+                detail="Transcription service busy, please retry",
+                headers={"Retry-After": str(WHISPER_RETRY_AFTER)}
             )
+        except Exception as e:
+            logger.error(f"Whisper transcription error: {e}")
+            # Fallback transcription for demo
+            transcribed_text = "This is a demo transcription. The participant completed their daily activities without any issues."
+        
+        if transcribed_text is None:
+            # Mock transcription for testing
+            transcribed_text = "This is a demo transcription. The participant completed their daily activities without any issues."
+        
+        if not transcribed_text:
+            raise HTTPException(status_code=400, detail="No speech detected")
+        
+        # Analyze and create note
+        note = await save_note(db, participant_id, current_user.id, transcribed_text, audio_duration)
+        
+        return VoiceTranscriptionResponse(
+            note_id=note.id,
+            participant_id=note.participant_id,
+            user_id=note.user_id,
+            transcribed_text=note.text,
+            timestamp=note.timestamp,
+            rp_flag=note.rp_flag,
+            audio_duration=audio_duration,
+            analysis_status=note.analysis_status
+        )
             
-            db.add(note)
-            db.commit()
-            db.refresh(note)
-            
-            # Check for training triggers
-            needs_training = await check_training_triggers(current_user.id, db)
-            
-            return VoiceTranscriptionResponse(
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Voice transcription error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.websocket("/api/voice-stream")
+async def voice_stream(
+    websocket: WebSocket,
+    participant_id: str,
+    token: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Streaming voice notes: binary audio chunks in, partial transcripts out.
+    
+    The client sends compressed audio chunks as binary frames and a text frame
+    {"type": "end"} when recording stops. A {"type": "partial"} message is sent
+    for every transcribed window, then {"type": "final"} with the created note.
+    """
+    await websocket.accept()
+    
+    # Browsers cannot set headers on WebSockets, so the ID token comes in the query string
+    try:
+        token_data = await verify_firebase_token(authorization=f"Bearer {token}")
+        current_user = await get_current_user(token_data=token_data, db=db)
+    except HTTPException as e:
+        await websocket.close(code=1008, reason=e.detail)
+        return
+    
+    participant = await db.get(Participant, participant_id)
+    if not participant:
+        await websocket.close(code=1008, reason="Participant not found")
+        return
+    
+    if not whisper_provider.ready:
+        whisper_provider.start()
+        await websocket.close(code=1013, reason="Transcription model loading, please retry")
+        return
+    
+    decoder = StreamingDecoder(window_seconds=WHISPER_STREAM_WINDOW)
+    await decoder.start()
+    
+    async def receive_audio():
+        received = 0
+        try:
+            while True:
+                try:
+                    message = await asyncio.wait_for(websocket.receive(), WHISPER_STREAM_IDLE_SECONDS)
+                except asyncio.TimeoutError:
+                    raise AudioTooLong(f"No audio received for {WHISPER_STREAM_IDLE_SECONDS:.0f}s")
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+                if message.get("bytes"):
+                    received += len(message["bytes"])
+                    if received > AUDIO_MAX_UPLOAD_BYTES:
+                        raise AudioTooLong(f"Stream larger than {AUDIO_MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+                    await decoder.feed(message["bytes"])
+                elif message.get("text") and json.loads(message["text"]).get("type") == "end":
+                    return
+        except BaseException:
+            # Stop ffmpeg so the transcription loop sees the end of the stream; the error surfaces on `await receiver`
+            await decoder.abort()
+            raise
+        finally:
+            await decoder.close()
+    
+    receiver = asyncio.create_task(receive_audio())
+    segments = []
+    try:
+        # Transcribe each window as soon as ffmpeg has decoded it
+        while True:
+            samples = await decoder.windows.get()
+            if samples is None:
+                break
+            if decoder.duration > AUDIO_MAX_SECONDS:
+                raise AudioTooLong(f"Recording longer than {AUDIO_MAX_SECONDS:.0f}s")
+            speech = await asyncio.to_thread(trim_silence, samples)
+            record_audio_trim(len(samples) / SAMPLE_RATE, len(speech) / SAMPLE_RATE)
+            if len(speech) == 0:
+                continue  # silent window, nothing to transcribe
+            segment_text = await transcription_pool.transcribe(speech)
+            if segment_text is None:
+                # No placeholder text here: whatever is transcribed becomes a care record
+                raise TranscriptionUnavailable("Transcription model not available")
+            segments.append(segment_text)
+            await websocket.send_json({
+                "type": "partial",
+                "index": len(segments) - 1,
+                "text": segment_text,
+                "duration": round(decoder.duration, 1)
+            })
+        await receiver
+        
+        transcribed_text = " ".join(s for s in segments if s).strip()
+        if not transcribed_text:
+            await websocket.send_json({"type": "error", "detail": "No speech detected"})
+            await websocket.close(code=1000)
+            return
+        
+        # Analyze and create note from the assembled transcript
+        audio_duration = max(1, round(decoder.duration))
+        note = await save_note(db, participant_id, current_user.id, transcribed_text, audio_duration)
+        
+        await websocket.send_json({
+            "type": "final",
+            **jsonable_encoder(VoiceTranscriptionResponse(
                 note_id=note.id,
                 participant_id=note.participant_id,
                 user_id=note.user_id,
                 transcribed_text=note.text,
                 timestamp=note.timestamp,
                 rp_flag=note.rp_flag,
-                audio_duration=audio_duration
-            )
-            
-        finally:
-            # Clean up temp file
-            try:
-                os.unlink(tmp_path)
-            except:
-                pass
-            
+                audio_duration=audio_duration,
+                analysis_status=note.analysis_status
+            ))
+        })
+        await websocket.close(code=1000)
+        
+    except WebSocketDisconnect:
+        logger.info("Voice stream disconnected before completion")
+    except AudioTooLong as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1009)
+    except TranscriptionQueueFull as e:
+        logger.warning(f"Transcription queue full: {e}")
+        await websocket.send_json({"type": "error", "detail": "Transcription service busy, please retry", "retry_after": WHISPER_RETRY_AFTER})
+        await websocket.close(code=1013)
+    except TranscriptionUnavailable as e:
+        logger.warning(f"Voice stream stopped: {e}")
+        await websocket.send_json({"type": "error", "detail": str(e), "retry_after": WHISPER_RETRY_AFTER})
+        await websocket.close(code=1013)
     except Exception as e:
-        logger.error(f"Voice transcription error: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
+        logger.error(f"Voice stream error: {str(e)}")
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1011)
+    finally:
+        receiver.cancel()
+        await decoder.abort()
 
 @app.post("/api/notes", response_model=NoteResponse)
 async def create_note(
     note: NoteCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a text note with GPT-4 analysis"""
     # Validate participant
-    participant = db.query(Participant).filter(Participant.id == note.participant_id).first()
+    participant = await db.get(Participant, note.participant_id)
     if not participant:
         raise HTTPException(status_code=404, detail="Participant not found")
     
-    # Analyze with GPT-4
-    analysis = await analyze_with_gpt4(note.text)
-    
-    # Create note
-    db_note = Note(
-        participant_id=note.participant_id,
-        user_id=current_user.id,
-        text=note.text,
-        rp_flag=analysis["rp_flag"],
-        gpt_response=json.dumps(analysis),
-        audio_duration=note.audio_duration
-    )
-    
-    db.add(db_note)
-    db.commit()
-    db.refresh(db_note)
-    
-    # Check for training triggers
-    needs_training = await check_training_triggers(current_user.id, db)
+    # Analyze and create note
+    db_note = await save_note(db, note.participant_id, current_user.id, note.text, note.audio_duration)
     
     return NoteResponse(
         id=db_note.id,
@@ -968,27 +2424,189 @@ async def create_note(
         gpt_response=db_note.gpt_response,
         participant_name=participant.name,
         user_name=current_user.name,
-        audio_duration=db_note.audio_duration
+        audio_duration=db_note.audio_duration,
+        analysis_status=db_note.analysis_status,
+        severity=db_note.severity
+    )
+
+@app.get("/api/notes/{note_id}/analysis", response_model=NoteAnalysisStatus)
+async def get_note_analysis(
+    note_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Poll the RP analysis status of a note"""
+    note = await db.get(Note, note_id)
+    if not note:
+        raise HTTPException(status_code=404, detail="Note not found")
+    
+    return NoteAnalysisStatus(
+        note_id=note.id,
+        analysis_status=note.analysis_status,
+        rp_flag=note.rp_flag,
+        gpt_response=note.gpt_response
+    )
+
+async def load_similar_notes(db: AsyncSession, hits: List[Tuple[str, float]]) -> List[SimilarNote]:
+    """Fetch index hits from the database, keeping the similarity order"""
+    result = await db.execute(
+        select(Note).options(joinedload(Note.participant), joinedload(Note.user)).filter(
+            Note.id.in_([note_id for note_id, _ in hits])
+        )
     )
+    notes = {note.id: note for note in result.scalars()}
+    similar = []
+    for note_id, score in hits:
+        note = notes.get(note_id)
+        if note:
+            similar.append(SimilarNote(
+                id=note.id,
+                participant_id=note.participant_id,
+                participant_name=note.participant.name if note.participant else None,
+                user_name=note.user.name if note.user else None,
+                text=note.text,
+                timestamp=note.timestamp,
+                rp_flag=note.rp_flag,
+                severity=note.severity,
+                score=round(score, 4)
+            ))
+    return similar
+
+@app.get("/api/notes/{note_id}/similar", response_model=List[SimilarNote])
+async def get_similar_notes(
+    note_id: str,
+    k: int = 5,
+    same_participant: bool = True,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Nearest past notes by embedding similarity, by default for the same participant"""
+    note = await db.get(Note, note_id)
+    if not note:
+        raise HTTPException(status_code=404, detail="Note not found")
+    if not note_index.ready:
+        raise HTTPException(status_code=503, detail="Similarity index is still loading", headers={"Retry-After": "5"})
+    
+    k = max(1, min(k, 50))
+    participant_id = note.participant_id if same_participant else None
+    if note_id in note_index:
+        hits = await asyncio.to_thread(note_index.similar_to, note_id, k, participant_id)
+    else:
+        hits = await asyncio.to_thread(note_index.search_text, note.text, k, participant_id, note_id)
+    return await load_similar_notes(db, hits)
+
+@app.post("/api/notes/reanalyze", response_model=ReanalysisJobResponse)
+async def start_reanalysis(
+    request: ReanalysisRequest,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Start (or resume) a bulk re-analysis of historical notes"""
+    if request.resume_job_id:
+        job = await db.get(ReanalysisJob, request.resume_job_id)
+        if not job:
+            raise HTTPException(status_code=404, detail="Reanalysis job not found")
+        if job.status == "complete":
+            return reanalysis_job_response(job)
+    else:
+        try:
+            start_dt = parse_iso_date(request.start_date)
+            end_dt = parse_iso_date(request.end_date)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Dates must be ISO 8601")
+        job = ReanalysisJob(
+            participant_id=request.participant_id,
+            start_date=start_dt,
+            end_date=end_dt,
+            batch_size=max(1, min(request.batch_size, 1000)),
+            concurrency=max(1, min(request.concurrency, 64))
+        )
+        db.add(job)
+        await db.commit()
+        await db.refresh(job)
+    
+    if job.id not in reanalysis_tasks:
+        reanalysis_tasks[job.id] = asyncio.create_task(run_reanalysis(job.id))
+    
+    return reanalysis_job_response(job)
+
+@app.get("/api/notes/reanalyze/{job_id}", response_model=ReanalysisJobResponse)
+async def get_reanalysis(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Progress of a bulk re-analysis job"""
+    job = await db.get(ReanalysisJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Reanalysis job not found")
+    return reanalysis_job_response(job)
+
+def encode_note_cursor(note: Note) -> str:
+    raw = f"{note.timestamp.isoformat()}|{note.id}"
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_note_cursor(cursor: str) -> Tuple[datetime, str]:
+    try:
+        timestamp, note_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        return datetime.fromisoformat(timestamp), note_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @app.get("/api/notes", response_model=List[NoteResponse])
 async def get_notes(
+    response: Response,
     participant_id: Optional[str] = None,
+    severity: Optional[str] = None,
+    practice: Optional[str] = None,
+    category: Optional[str] = None,
     skip: int = 0,
     limit: int = 50,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get notes with mobile-optimized pagination"""
-    query = db.query(Note)
+    """Get notes with mobile-optimized pagination
+    
+    Pass the X-Next-Cursor response header back as `cursor` to fetch the next page;
+    keyset pagination on (timestamp, id) stays fast however deep the page.
+    `severity`, `practice` and `category` filter on the structured analysis columns.
+    """
+    limit = max(1, min(limit, 200))
+    
+    # Load participant and user names in the same query
+    query = select(Note).options(joinedload(Note.participant), joinedload(Note.user))
     
     if participant_id:
         query = query.filter(Note.participant_id == participant_id)
     
+    if severity:
+        query = query.filter(Note.severity == severity.lower())
+    
+    if practice:
+        query = query.filter(Note.id.in_(
+            select(NotePractice.note_id).where(NotePractice.practice == practice.strip().lower())
+        ))
+    
+    if category:
+        query = query.filter(Note.id.in_(
+            select(NotePractice.note_id).where(NotePractice.category == category.lower())
+        ))
+    
+    if cursor:
+        cursor_timestamp, cursor_id = decode_note_cursor(cursor)
+        # Row-value comparison so the index seeks straight to the cursor instead of scanning newer rows
+        query = query.filter(tuple_(Note.timestamp, Note.id) < (cursor_timestamp, cursor_id))
+    
     # Order by newest first
-    query = query.order_by(desc(Note.timestamp))
+    query = query.order_by(desc(Note.timestamp), desc(Note.id))
     
-    notes = query.offset(skip).limit(limit).all()
+    if not cursor and skip:
+        query = query.offset(skip)
+    notes = (await db.execute(query.limit(limit))).scalars().all()
+    
+    if len(notes) == limit:
+        response.headers["X-Next-Cursor"] = encode_note_cursor(notes[-1])
     
     # Mobile-optimized response
     response_notes = []
@@ -1003,22 +2621,142 @@ async def get_notes(
             gpt_response=note.gpt_response,
             participant_name=note.participant.name if note.participant else None,
             user_name=note.user.name if note.user else None,
-            audio_duration=note.audio_duration
+            audio_duration=note.audio_duration,
+            analysis_status=note.analysis_status,
+            severity=note.severity
         ))
     
     return response_notes
 
+SEARCH_HIGHLIGHT = ("<mark>", "</mark>")
+
+def fts5_match_query(q: str, participant_id: Optional[str] = None) -> Optional[str]:
+    """Turn free text into an FTS5 query: every term required, matched on the text column"""
+    terms = re.findall(r"\w+", q.lower())
+    if not terms:
+        return None
+    match = "{text}: (" + " ".join(f'"{term}"' for term in terms) + ")"
+    if participant_id:
+        match += ' AND {participant_id}: "' + participant_id.replace('"', '""') + '"'
+    return match
+
+@app.get("/api/notes/search", response_model=List[NoteSearchResult])
+async def search_notes(
+    q: str,
+    participant_id: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    limit: int = 20,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Ranked full-text search over note text with highlighted snippets
+    
+    Results are the best `limit` matches among the newest SEARCH_CANDIDATES,
+    which keeps queries for very common terms bounded.
+    """
+    if note_search_backend is None:
+        raise HTTPException(status_code=501, detail="Full-text search is not available on this database")
+    try:
+        start_dt = parse_iso_date(start_date)
+        end_dt = parse_iso_date(end_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be ISO 8601")
+    
+    limit = max(1, min(limit, 100))
+    params: Dict[str, Any] = {"limit": limit, "candidates": SEARCH_CANDIDATES}
+    filters = []
+    if participant_id and note_search_backend == "tsvector":
+        filters.append("n.participant_id = :participant_id")
+        params["participant_id"] = participant_id
+    if start_dt:
+        filters.append("n.timestamp >= :start_date")
+        params["start_date"] = start_dt
+    if end_dt:
+        filters.append("n.timestamp <= :end_date")
+        params["end_date"] = end_dt
+    where = "".join(f" AND {f}" for f in filters)
+    start_sel, stop_sel = SEARCH_HIGHLIGHT
+    
+    if note_search_backend == "fts5":
+        params["q"] = fts5_match_query(q, participant_id)
+        if params["q"] is None:
+            return []
+        # Newest candidates come off the FTS index in rowid order, are ranked with bm25()
+        # (lower is better, participant column weighted 0), and only the top rows get snippets
+        statement = f"""
+            WITH top AS (
+                SELECT rowid, rank FROM (
+                    SELECT notes_fts.rowid AS rowid, bm25(notes_fts, 1.0, 0.0) AS rank
+                    FROM notes_fts
+                    JOIN notes n ON n.rowid = notes_fts.rowid
+                    WHERE notes_fts MATCH :q{where}
+                    ORDER BY notes_fts.rowid DESC
+                    LIMIT :candidates
+                )
+                ORDER BY rank
+                LIMIT :limit
+            )
+            SELECT n.id, n.participant_id, p.name AS participant_name, n.user_id, u.name AS user_name,
+                   n.timestamp, n.rp_flag, n.severity,
+                   snippet(notes_fts, 0, '{start_sel}', '{stop_sel}', '...', 16) AS snippet,
+                   -top.rank AS rank
+            FROM top
+            JOIN notes_fts ON notes_fts.rowid = top.rowid
+            JOIN notes n ON n.rowid = top.rowid
+            LEFT JOIN participants p ON p.id = n.participant_id
+            LEFT JOIN users u ON u.id = n.user_id
+            WHERE notes_fts MATCH :q
+            ORDER BY top.rank
+        """
+    else:
+        params["q"] = q
+        # Rank the newest candidates, then build headlines for the returned rows only
+        statement = f"""
+            SELECT m.id, m.participant_id, p.name AS participant_name, m.user_id, u.name AS user_name,
+                   m.timestamp, m.rp_flag, m.severity,
+                   ts_headline('english', m.text, m.query,
+                               'StartSel={start_sel}, StopSel={stop_sel}, MaxWords=24, MinWords=8') AS snippet,
+                   m.rank
+            FROM (
+                SELECT c.*, ts_rank(c.text_search, c.query) AS rank
+                FROM (
+                    SELECT n.*, query
+                    FROM notes n, websearch_to_tsquery('english', :q) query
+                    WHERE n.text_search @@ query{where}
+                    ORDER BY n.timestamp DESC
+                    LIMIT :candidates
+                ) c
+                ORDER BY rank DESC
+                LIMIT :limit
+            ) m
+            LEFT JOIN participants p ON p.id = m.participant_id
+            LEFT JOIN users u ON u.id = m.user_id
+            ORDER BY m.rank DESC
+        """
+    
+    rows = (await db.execute(sql_text(statement), params)).mappings().all()
+    return [NoteSearchResult(**row) for row in rows]
+
 @app.get("/api/participants", response_model=List[ParticipantResponse])
 async def get_participants(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get all participants with note counts"""
-    participants = db.query(Participant).all()
+    # Count notes for every participant in one grouped query instead of one query per participant
+    note_counts = select(
+        Note.participant_id,
+        func.count(Note.id).label("notes_count")
+    ).group_by(Note.participant_id).subquery()
+    
+    participants = (await db.execute(select(
+        Participant,
+        func.coalesce(note_counts.c.notes_count, 0)
+    ).outerjoin(note_counts, note_counts.c.participant_id == Participant.id))).all()
     
     response = []
-    for p in participants:
-        notes_count = db.query(Note).filter(Note.participant_id == p.id).count()
+    for p, notes_count in participants:
         response.append(ParticipantResponse(
             id=p.id,
             name=p.name,
@@ -1032,13 +2770,14 @@ async def get_participants(
 async def create_participant(
     participant: ParticipantCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create new participant"""
     db_participant = Participant(name=participant.name)
     db.add(db_participant)
-    db.commit()
-    db.refresh(db_participant)
+    await bump_stats_async(db, participants=1)
+    await db.commit()
+    await db.refresh(db_participant)
     
     return ParticipantResponse(
         id=db_participant.id,
@@ -1051,48 +2790,34 @@ async def create_participant(
 async def ask_nova(
     request: AskNovaRequest,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Nova AI Assistant with GPT-4 powered responses"""
     try:
-        # Create thread for conversation context
-        thread = openai_client.beta.threads.create()
-        
         # Add context if participant is specified
         context_msg = ""
         if request.context.get("participant_id"):
-            participant = db.query(Participant).filter(
-                Participant.id == request.context["participant_id"]
-            ).first()
+            participant = await db.get(Participant, request.context["participant_id"])
             if participant:
                 context_msg = f"Context: Question about participant {participant.name}. "
+                
+                # Prior notes for this participant that resemble the question
+                if NOVA_SIMILAR_NOTES > 0 and note_index.ready:
+                    hits = await asyncio.to_thread(
+                        note_index.search_text, request.question, NOVA_SIMILAR_NOTES, participant.id
+                    )
+                    similar = await load_similar_notes(db, hits)
+                    if similar:
+                        context_msg += "Similar past notes for this participant: " + " ".join(
+                            f"[{n.timestamp.strftime('%Y-%m-%d')}{', RP flagged' if n.rp_flag else ''}] {n.text[:300]}"
+                            for n in similar
+                        ) + " "
         
-        # Add message to thread
-        message = openai_client.beta.threads.messages.create(
-            thread_id=thread.id,
-            role="user",
-            content=f"{context_msg}Support worker question: {request.question}"
+        # Ask the model (thread_id is only set by the Assistant backend)
+        thread_id, response = await ask_model(
+            f"{context_msg}Support worker question: {request.question}"
         )
         
-        # Run the assistant
-        run = openai_client.beta.threads.runs.create(
-            thread_id=thread.id,
-            assistant_id=ASSISTANT_ID
-        )
-        
-        # Wait for completion
-        while run.status != "completed":
-            run = openai_client.beta.threads.runs.retrieve(
-                thread_id=thread.id,
-                run_id=run.id
-            )
-            if run.status == "failed":
-                raise Exception("Assistant run failed")
-        
-        # Get the response
-        messages = openai_client.beta.threads.messages.list(thread_id=thread.id)
-        response = messages.data[0].content[0].text.value
-        
         # Parse JSON response
         result = json.loads(response)
         
@@ -1102,13 +2827,12 @@ async def ask_nova(
             text=request.question,
             response=result["response"],
             intent_type=result.get("intent", "question"),
-            thread_id=thread.id
+            thread_id=thread_id
         )
         db.add(query_log)
-        db.commit()
-        
-        # Check for training triggers
-        needs_training = await check_training_triggers(current_user.id, db)
+        await db.commit()
+        await db.refresh(query_log)
+        record_query(current_user.id, query_log.timestamp)
         
         return AskNovaResponse(
             response=result["response"],
@@ -1160,17 +2884,29 @@ async def ask_nova(
 
 @app.get("/api/stats")
 async def get_stats(
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get dashboard statistics with training prompt status"""
-    total_notes = db.query(Note).count()
-    rp_notes = db.query(Note).filter(Note.rp_flag == True).count()
-    my_notes = db.query(Note).filter(Note.user_id == current_user.id).count()
-    participants = db.query(Participant).count()
-    
-    # Check if user needs training
-    needs_training = await check_training_triggers(current_user.id, db)
+    """Get dashboard statistics from the materialized counters
+    
+    Responses carry an ETag; polling with If-None-Match returns 304 until a count changes.
+    """
+    my_notes_key = user_notes_key(current_user.id)
+    counters = dict((await db.execute(select(StatsCounter.key, StatsCounter.value).filter(
+        StatsCounter.key.in_(["notes", "rp_notes", "participants", my_notes_key])
+    ))).all())
+    total_notes = counters.get("notes", 0)
+    rp_notes = counters.get("rp_notes", 0)
+    my_notes = counters.get(my_notes_key, 0)
+    participants = counters.get("participants", 0)
+    
+    etag = 'W/"' + hashlib.sha1(f"{total_notes}:{rp_notes}:{my_notes}:{participants}".encode()).hexdigest() + '"'
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
     
     return {
         "total_notes": total_notes,
@@ -1178,20 +2914,66 @@ async def get_stats(
         "my_notes": my_notes,
         "participants": participants,
         "rp_percentage": round((rp_notes / total_notes * 100) if total_notes > 0 else 0, 1),
-        # "needs_training": needs_training
+    }
+
+@app.get("/api/stats/practices")
+async def get_practice_stats(
+    participant_id: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Counts of detected practices, categories and severities"""
+    try:
+        start_dt = parse_iso_date(start_date)
+        end_dt = parse_iso_date(end_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Dates must be ISO 8601")
+    
+    def filtered(query):
+        if participant_id:
+            query = query.filter(Note.participant_id == participant_id)
+        if start_dt:
+            query = query.filter(Note.timestamp >= start_dt)
+        if end_dt:
+            query = query.filter(Note.timestamp <= end_dt)
+        return query
+    
+    practices = (await db.execute(filtered(
+        select(NotePractice.practice, NotePractice.category, func.count(NotePractice.id))
+        .join(Note, Note.id == NotePractice.note_id)
+    ).group_by(NotePractice.practice, NotePractice.category).order_by(desc(func.count(NotePractice.id))))).all()
+    
+    severities = (await db.execute(filtered(
+        select(Note.severity, func.count(Note.id)).filter(Note.severity.isnot(None))
+    ).group_by(Note.severity))).all()
+    
+    categories: Dict[str, int] = {}
+    for _, category, count in practices:
+        if category:
+            categories[category] = categories.get(category, 0) + count
+    
+    return {
+        "practices": [
+            {"practice": practice, "category": category, "count": count}
+            for practice, category, count in practices
+        ],
+        "categories": categories,
+        "severity": dict(severities),
     }
 # Add these training endpoints after existing endpoints (around line 600)
 
 @app.get("/api/training-modules")
 async def get_training_modules(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get available training modules with completion status"""
     modules = []
     
     for module_id, module_data in TRAINING_MODULES.items():
-        completed = has_completed_training(current_user.id, module_id, db)
+        completed = await has_completed_training(current_user.id, module_id, db)
         modules.append({
             "id": module_data["id"],
             "title": module_data["title"], 
@@ -1207,14 +2989,14 @@ async def get_training_modules(
 async def get_training_module(
     module_id: str,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get specific training module content"""
     if module_id not in TRAINING_MODULES:
         raise HTTPException(status_code=404, detail="Training module not found")
     
     module = TRAINING_MODULES[module_id].copy()
-    module["completed"] = has_completed_training(current_user.id, module_id, db)
+    module["completed"] = await has_completed_training(current_user.id, module_id, db)
     
     return module
 
@@ -1222,7 +3004,7 @@ async def get_training_module(
 async def complete_training(
     request: dict,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Mark training module as completed"""
     module_id = request.get("module_id")
@@ -1232,12 +3014,12 @@ async def complete_training(
         raise HTTPException(status_code=404, detail="Training module not found")
     
     # Check if already completed
-    existing = db.query(TrainingCompletion).filter(
+    existing = (await db.execute(select(TrainingCompletion).filter(
         and_(
             TrainingCompletion.user_id == current_user.id,
             TrainingCompletion.module_id == module_id
         )
-    ).first()
+    ))).scalars().first()
     
     if existing:
         return {"message": "Training already completed", "completed_at": existing.completed_at}
@@ -1250,8 +3032,8 @@ async def complete_training(
     )
     
     db.add(completion)
-    db.commit()
-    db.refresh(completion)
+    await db.commit()
+    await db.refresh(completion)
     
     return {
         "message": "Training completed successfully",
@@ -1263,15 +3045,15 @@ async def complete_training(
 @app.get("/api/training-progress")
 async def get_training_progress(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get user's training progress and recommendations"""
     total_modules = len(TRAINING_MODULES)
-    completed_modules = db.query(TrainingCompletion).filter(
+    completed_modules = (await db.execute(select(func.count(TrainingCompletion.id)).filter(
         TrainingCompletion.user_id == current_user.id
-    ).count()
+    ))).scalar()
     
-    recommended_modules = get_recommended_modules(current_user.id, db)
+    recommended_modules = get_recommended_modules(current_user.id)
     
     return {
         "total_modules": total_modules,
@@ -1283,32 +3065,17 @@ async def get_training_progress(
 @app.get("/api/training-status")
 async def get_training_status(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Check if user needs training with specific recommendations"""
-    needs_training = await check_training_triggers(current_user.id, db)
+    needs_training = await check_training_triggers(current_user.id)
     
     if needs_training:
-        twenty_four_hours_ago = datetime.utcnow() - timedelta(hours=24)
-        
         # Get details for training prompt
-        rp_notes = db.query(Note).filter(
-            and_(
-                Note.user_id == current_user.id,
-                Note.timestamp >= twenty_four_hours_ago,
-                Note.rp_flag == True
-            )
-        ).count()
-        
-        queries = db.query(QueryLog).filter(
-            and_(
-                QueryLog.user_id == current_user.id,
-                QueryLog.timestamp >= twenty_four_hours_ago
-            )
-        ).count()
+        rp_notes, queries = get_activity_counts(current_user.id)
         
         # Get recommended modules
-        recommended_modules = get_recommended_modules(current_user.id, db)
+        recommended_modules = get_recommended_modules(current_user.id)
         
         # Get module details for recommendations
         modules_info = []
@@ -1333,9 +3100,55 @@ async def get_training_status(
     
     return {"needs_training": False, "message": "No training needed at this time"}
 
+def reanalyze_command(args):
+    """Run or resume a re-analysis job from the command line"""
+    setup_database()
+    db = SessionLocal()
+    try:
+        if args.job:
+            job_id = args.job
+        else:
+            job = ReanalysisJob(
+                participant_id=args.participant_id,
+                start_date=parse_iso_date(args.start_date),
+                end_date=parse_iso_date(args.end_date),
+                batch_size=args.batch_size,
+                concurrency=args.concurrency
+            )
+            db.add(job)
+            db.commit()
+            job_id = job.id
+            print(f"Created reanalysis job {job_id}")
+    finally:
+        db.close()
+    
+    asyncio.run(run_reanalysis(job_id))
+    
+    db = SessionLocal()
+    try:
+        job = db.query(ReanalysisJob).filter(ReanalysisJob.id == job_id).first()
+        print(f"Job {job.id} {job.status}: {job.processed} processed, {job.flagged} flagged, {job.changed} changed")
+    finally:
+        db.close()
+
 if __name__ == "__main__":
-    uvicorn.run(
-        app, 
-        host=os.getenv("API_HOST", "0.0.0.0"), 
-        port=int(os.getenv("API_PORT", "8000"))
-    )
+    parser = argparse.ArgumentParser(description="CareIQ API")
+    subcommands = parser.add_subparsers(dest="command")
+    reanalyze_parser = subcommands.add_parser("reanalyze", help="Re-score historical notes")
+    reanalyze_parser.add_argument("--job", help="Resume an existing job ID")
+    reanalyze_parser.add_argument("--participant-id")
+    reanalyze_parser.add_argument("--start-date")
+    reanalyze_parser.add_argument("--end-date")
+    reanalyze_parser.add_argument("--batch-size", type=int, default=200)
+    reanalyze_parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    
+    if args.command == "reanalyze":
+        reanalyze_command(args)
+    else:
+        import uvicorn
+        uvicorn.run(
+            app, 
+            host=os.getenv("API_HOST", "0.0.0.0"), 
+            port=int(os.getenv("API_PORT", "8000"))
+        )
@@ -0,0 +1,165 @@
+"""Audio preprocessing before Whisper.
+
+Uploads are decoded once by ffmpeg to 16 kHz mono float32 samples, then a
+frame-energy voice activity detector drops leading and trailing silence and
+shortens long pauses, so Whisper only sees the speech (and does not
+hallucinate text over silence). Duration comes from the decoded sample
+count rather than the compressed upload size.
+
+Nothing touches the filesystem: the upload is piped into ffmpeg's stdin and
+PCM is read back from its stdout. MP4-family files keep their index at the
+end and need a seekable input, so those go through an anonymous in-memory
+file (memfd) instead of the pipe.
+"""
+import os
+import asyncio
+import logging
+from dataclasses import dataclass
+
+import numpy as np
+
+from transcription import SAMPLE_RATE
+
+logger = logging.getLogger(__name__)
+
+FRAME_MS = 30
+SPEECH_MARGIN_DB = 12.0  # frame must be this far above the noise floor to count as speech
+MIN_SPEECH_DBFS = -50.0  # and never quieter than this, so near-silent files stay silent
+SPEECH_PAD_MS = 240  # kept around each speech run so word onsets/endings aren't clipped
+MAX_PAUSE_MS = 1000  # internal silences longer than this are cut down to it
+
+
+class AudioDecodeError(Exception):
+    """Raised when ffmpeg cannot decode the upload"""
+
+
+class AudioTooLong(Exception):
+    """Raised when the decoded recording exceeds the allowed length"""
+
+
+@dataclass
+class PreparedAudio:
+    samples: np.ndarray  # float32, 16 kHz mono, silence trimmed
+    duration: float  # seconds of the original recording
+    speech_duration: float  # seconds left after trimming
+    peak_bytes: int  # largest amount of audio buffered at once while preparing
+
+
+def needs_seekable_input(data: bytes) -> bool:
+    # ISO base media (mp4, m4a, mov, 3gp) starts with an ftyp box
+    return data[4:8] == b"ftyp"
+
+
+async def decode_audio(data: bytes, max_seconds: float) -> np.ndarray:
+    """Decode an upload held in memory to 16 kHz mono float32 samples"""
+    memfd = None
+    if needs_seekable_input(data) and hasattr(os, "memfd_create"):
+        memfd = os.memfd_create("careiq-upload")
+        view = memoryview(data)
+        while view:
+            view = view[os.write(memfd, view):]
+        source, pass_fds = f"/proc/self/fd/{memfd}", (memfd,)
+    else:
+        source, pass_fds = "pipe:0", ()
+
+    try:
+        process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-nostdin", "-loglevel", "error",
+            "-i", source,
+            "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE),
+            "pipe:1",
+            stdin=asyncio.subprocess.DEVNULL if memfd is not None else asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            pass_fds=pass_fds
+        )
+    finally:
+        if memfd is not None:
+            os.close(memfd)  # the child holds its own copy
+
+    async def feed():
+        try:
+            process.stdin.write(data)
+            await process.stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # ffmpeg stopped reading; its exit status says why
+        finally:
+            process.stdin.close()
+
+    feeder = asyncio.create_task(feed()) if memfd is None else None
+    errors = asyncio.create_task(process.stderr.read())
+    max_bytes = int(max_seconds * SAMPLE_RATE) * 2
+    pcm = bytearray()
+    try:
+        while True:
+            chunk = await process.stdout.read(65536)
+            if not chunk:
+                break
+            pcm.extend(chunk)
+            if len(pcm) > max_bytes:
+                raise AudioTooLong(f"Recording longer than {max_seconds:.0f}s")
+        await process.wait()
+    finally:
+        if process.returncode is None:
+            process.kill()
+            await process.wait()
+        if feeder:
+            await feeder
+        stderr = await errors
+
+    if process.returncode != 0:
+        raise AudioDecodeError(stderr.decode("utf-8", "replace").strip() or f"ffmpeg exited with {process.returncode}")
+    samples = np.frombuffer(pcm, dtype=np.int16, count=len(pcm) // 2).astype(np.float32)
+    samples /= 32768.0
+    return samples
+
+
+def speech_frames(samples: np.ndarray, frame: int) -> np.ndarray:
+    """Boolean speech flag per frame from RMS energy against an adaptive noise floor"""
+    frames = len(samples) // frame
+    if frames == 0:
+        return np.zeros(0, dtype=bool)
+    blocks = samples[:frames * frame].reshape(frames, frame)
+    # Row-wise sum of squares without materializing a squared copy of the recording
+    energy_db = 10 * np.log10(np.einsum("ij,ij->i", blocks, blocks) / frame + 1e-10)
+    noise_floor = np.percentile(energy_db, 10)
+    return energy_db > max(noise_floor + SPEECH_MARGIN_DB, MIN_SPEECH_DBFS)
+
+
+def trim_silence(samples: np.ndarray) -> np.ndarray:
+    """Drop leading/trailing silence and cap internal pauses at MAX_PAUSE_MS"""
+    frame = SAMPLE_RATE * FRAME_MS // 1000
+    speech = speech_frames(samples, frame)
+    if not speech.any():
+        return samples[:0]
+
+    # Widen every speech run by the pad on both sides
+    pad = SPEECH_PAD_MS // FRAME_MS
+    keep = np.convolve(speech, np.ones(2 * pad + 1), mode="same") > 0
+
+    # Kept runs as [start, end) frame ranges; each gap after a run keeps its first MAX_PAUSE_MS
+    edges = np.flatnonzero(np.diff(np.concatenate([[0], keep.astype(np.int8), [0]])))
+    starts, ends = edges[::2], edges[1::2]
+    ends = np.append(np.minimum(ends[:-1] + MAX_PAUSE_MS // FRAME_MS, starts[1:]), ends[-1])
+
+    pieces = [samples[start * frame:end * frame] for start, end in zip(starts, ends)]
+    if ends[-1] == len(keep):
+        # Samples after the last whole frame follow the last frame's decision
+        pieces[-1] = samples[starts[-1] * frame:]
+    # Slices are views, so the only copy is the trimmed output
+    return np.concatenate(pieces)
+
+
+async def prepare_audio(data: bytes, max_seconds: float) -> PreparedAudio:
+    """Decode and VAD-trim an uploaded recording"""
+    samples = await decode_audio(data, max_seconds)
+    trimmed = await asyncio.to_thread(trim_silence, samples)
+    prepared = PreparedAudio(
+        samples=trimmed,
+        duration=len(samples) / SAMPLE_RATE,
+        speech_duration=len(trimmed) / SAMPLE_RATE,
+        # Upload + int16 PCM + float32 samples during conversion, or upload + samples + trimmed copy after
+        peak_bytes=len(data) + max(samples.nbytes * 3 // 2, samples.nbytes + trimmed.nbytes),
+    )
+    logger.info(f"Audio {prepared.duration:.1f}s, {prepared.speech_duration:.1f}s after silence trimming")
+    return prepared
@@ -0,0 +1,156 @@
+"""Firebase ID token verification with in-process caches.
+
+Verified tokens are kept until their `exp` claim, so the parallel requests a
+dashboard refresh fires check a token's signature once. Google's signing
+certificates are fetched once, parsed into public keys, and reused for the
+max-age the endpoint advertises. Set FIREBASE_CERTS_FILE to a JSON file of
+{kid: PEM certificate} to verify against local keys instead of Google's
+(`python bench.py auth` does this).
+"""
+import re
+import json
+import time
+import logging
+import threading
+import urllib.request
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import jwt
+from cryptography.x509 import load_pem_x509_certificate
+
+logger = logging.getLogger(__name__)
+
+ID_TOKEN_CERT_URL = "https://www.googleapis.com/robot/v1/metadata/x509/securetoken@system.gserviceaccount.com"
+ID_TOKEN_ISSUER_PREFIX = "https://securetoken.google.com/"
+MAX_AGE = re.compile(r"max-age=(\d+)")
+
+
+class ExpiringLRU:
+    """Bounded LRU whose entries also expire at a per-entry unix time"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self.entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= time.time():
+            del self.entries[key]
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return value
+
+    def put(self, key: str, value: Any, expires_at: float):
+        if self.max_entries <= 0:
+            return
+        self.entries[key] = (expires_at, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+        }
+
+
+class PublicKeyCache:
+    """Signing keys by kid, refreshed when their max-age runs out or an unknown kid shows up"""
+
+    def __init__(self, url: str = ID_TOKEN_CERT_URL, certs_file: Optional[str] = None,
+                 min_refresh_seconds: int = 60):
+        self.url = url
+        self.certs_file = certs_file
+        self.min_refresh_seconds = min_refresh_seconds
+        self.keys: Dict[str, Any] = {}
+        self.expires_at = 0.0
+        self.fetched_at = 0.0
+        self.fetches = 0
+        self.lock = threading.Lock()
+
+    def _fetch(self) -> tuple:
+        if self.certs_file:
+            with open(self.certs_file, encoding="utf-8") as f:
+                return json.load(f), float("inf")
+        with urllib.request.urlopen(self.url, timeout=10) as response:
+            certs = json.loads(response.read())
+            max_age = MAX_AGE.search(response.headers.get("Cache-Control", ""))
+        return certs, time.time() + (int(max_age.group(1)) if max_age else 3600)
+
+    def get(self, kid: str):
+        """Public key for `kid`, or None if the current key set does not have it"""
+        now = time.time()
+        key = self.keys.get(kid)
+        if key is not None and now < self.expires_at:
+            return key
+        with self.lock:
+            stale = time.time() >= self.expires_at
+            # Unknown kids refetch at most once a minute so forged headers can't trigger a fetch per request
+            unknown = kid not in self.keys and time.time() - self.fetched_at >= self.min_refresh_seconds
+            if stale or unknown:
+                certs, expires_at = self._fetch()
+                self.keys = {
+                    kid: load_pem_x509_certificate(pem.encode("utf-8")).public_key()
+                    for kid, pem in certs.items()
+                }
+                self.expires_at = expires_at
+                self.fetched_at = time.time()
+                self.fetches += 1
+                logger.info(f"Loaded {len(self.keys)} Firebase signing keys")
+            return self.keys.get(kid)
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "source": self.certs_file or self.url,
+            "keys": len(self.keys),
+            "fetches": self.fetches,
+            "expires_in_seconds": round(self.expires_at - time.time()) if self.keys and self.expires_at != float("inf") else None,
+        }
+
+
+class FirebaseTokenVerifier:
+    """Checks the signature and claims of a Firebase ID token the way auth.verify_id_token does"""
+
+    def __init__(self, project_id: str, keys: PublicKeyCache, clock_skew_seconds: int = 0):
+        self.project_id = project_id
+        self.keys = keys
+        self.issuer = ID_TOKEN_ISSUER_PREFIX + project_id
+        self.clock_skew_seconds = clock_skew_seconds
+
+    def verify(self, token: str) -> Dict[str, Any]:
+        """Decoded claims with `uid` set, or jwt.InvalidTokenError"""
+        header = jwt.get_unverified_header(token)
+        if header.get("alg") != "RS256":
+            raise jwt.InvalidAlgorithmError(f"Expected RS256, got {header.get('alg')}")
+        key = self.keys.get(header.get("kid", ""))
+        if key is None:
+            raise jwt.InvalidKeyError(f"Unknown signing key {header.get('kid')}")
+
+        claims = jwt.decode(
+            token,
+            key,
+            algorithms=["RS256"],
+            audience=self.project_id,
+            issuer=self.issuer,
+            leeway=self.clock_skew_seconds,
+            options={"require": ["exp", "iat", "sub"]},
+        )
+        subject = claims["sub"]
+        if not isinstance(subject, str) or not subject or len(subject) > 128:
+            raise jwt.InvalidTokenError("Invalid sub claim")
+        claims["uid"] = subject
+        return claims
@@ -0,0 +1,756 @@
+"""Benchmarks for CareIQ hot paths.
+
+Each benchmark runs against a throwaway SQLite database, never careiq.db.
+
+    python bench.py participants --participants 10000 --notes-per-participant 3
+    python bench.py indexes
+    python bench.py search --participants 100000 --notes-per-participant 10
+    python bench.py similar --participants 10000 --notes-per-participant 10
+    python bench.py writes --threads 16 --writes-per-thread 200 --readers 4
+    python bench.py concurrency --clients 32 --requests-per-client 25
+    python bench.py auth --requests 3000
+    python bench.py startup --participants 100000 --notes-per-participant 10
+    python bench.py audio --seconds 60 300 600
+    python bench.py whisper --batch-sizes 1 2 4 8 --uploads 16 --model tiny
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import random
+import argparse
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+
+def load_app(database_path: str):
+    """Import the API against a scratch database with auth disabled"""
+    os.environ["DATABASE_URL"] = f"sqlite:///{database_path}"
+    os.environ["NOTE_INDEX_DIR"] = os.path.join(os.path.dirname(database_path), "note_index")
+    os.environ["DISABLE_AUTH"] = "true"
+    os.environ.setdefault("OPENAI_BACKEND", "chat")
+    import app
+    app.setup_database()  # the server runs this after startup; benchmarks seed tables right away
+    return app
+
+
+@contextmanager
+def count_queries(engine):
+    """Count SQL statements executed inside the block"""
+    from sqlalchemy import event
+    counter = {"queries": 0}
+
+    def before_cursor_execute(*args):
+        counter["queries"] += 1
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+# One loop for all handler calls: pooled aiosqlite connections belong to the loop that opened them
+loop = asyncio.new_event_loop()
+
+
+def call_handler(app, handler, **kwargs):
+    """Run an async-session request handler outside of a request"""
+    async def run():
+        async with app.AsyncSessionLocal() as db:
+            return await handler(db=db, **kwargs)
+    return loop.run_until_complete(run())
+
+
+def timed(label: str, engine, fn, repeat: int = 3):
+    best = None
+    for _ in range(repeat):
+        with count_queries(engine) as counter:
+            start = time.perf_counter()
+            fn()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{label:<32} {best * 1000:>10.1f} ms {counter['queries']:>8} queries")
+    return best
+
+
+NOTE_PHRASES = [
+    "Walked to the shops and chose lunch.",
+    "Had a quiet morning watching the cricket.",
+    "Became upset at dinner and was offered a choice of meals.",
+    "Staff locked the back door while cleaning the yard.",
+    "Took medication with breakfast without any issues.",
+    "Went swimming at the community pool with a support worker.",
+    "Refused to get ready for day program, calmed down after music.",
+    "Was restrained briefly during a fall risk incident.",
+    "Visited family in the afternoon and enjoyed the garden.",
+    "Needed prompting with personal care but completed it independently.",
+]
+
+
+def note_text(rng: random.Random) -> str:
+    return " ".join(rng.sample(NOTE_PHRASES, 3))
+
+
+def seed_notes(app, participants: int, notes_per_participant: int, users: int = 20):
+    rng = random.Random(42)
+    db = app.SessionLocal()
+    try:
+        user_ids = [str(uuid.uuid4()) for _ in range(users)]
+        db.bulk_insert_mappings(app.User, [
+            {"id": uid, "firebase_uid": f"bench-{i}", "name": f"Bench {i}", "email": f"bench{i}@careiq.com"}
+            for i, uid in enumerate(user_ids)
+        ])
+        participant_ids = [str(uuid.uuid4()) for _ in range(participants)]
+        db.bulk_insert_mappings(app.Participant, [
+            {"id": pid, "name": f"Participant {i}", "created_at": datetime.utcnow()}
+            for i, pid in enumerate(participant_ids)
+        ])
+        start = datetime.utcnow() - timedelta(days=30)
+        notes = [
+            {
+                "id": str(uuid.uuid4()),
+                "participant_id": pid,
+                "user_id": user_ids[(i + n) % users],
+                "text": note_text(rng),
+                "timestamp": start + timedelta(seconds=i * notes_per_participant + n),
+                "rp_flag": n == 0 and i % 10 == 0,
+                "severity": "medium" if n == 0 and i % 10 == 0 else "low",
+                "analysis_status": "complete",
+            }
+            for i, pid in enumerate(participant_ids)
+            for n in range(notes_per_participant)
+        ]
+        db.bulk_insert_mappings(app.Note, notes)
+        db.bulk_insert_mappings(app.NotePractice, [
+            {"note_id": note["id"], "practice": "locked door", "category": "environmental"}
+            for note in notes if note["rp_flag"]
+        ])
+        db.commit()
+    finally:
+        db.close()
+
+
+def bench_participants(app, args):
+    """GET /api/participants: per-participant count() vs one grouped aggregate"""
+    seed_notes(app, args.participants, args.notes_per_participant)
+
+    def per_participant_counts():
+        # The original N+1 implementation, kept here as the baseline
+        db = app.SessionLocal()
+        try:
+            for p in db.query(app.Participant).all():
+                db.query(app.Note).filter(app.Note.participant_id == p.id).count()
+        finally:
+            db.close()
+
+    def grouped_counts():
+        call_handler(app, app.get_participants, current_user=None)
+
+    print(f"{args.participants} participants, {args.notes_per_participant} notes each")
+    before = timed("per-participant count()", app.engine, per_participant_counts)
+    after = timed("grouped aggregate", app.async_engine.sync_engine, grouped_counts)
+    print(f"speedup: {before / after:.1f}x")
+
+
+def explain(app, query):
+    """SQLite query plan lines for an ORM query"""
+    compiled = query.statement.compile(dialect=app.engine.dialect)
+    params = tuple(
+        str(value) if isinstance(value, datetime) else value
+        for value in (compiled.params[name] for name in compiled.positiontup)
+    )
+    with app.engine.connect() as conn:
+        rows = conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+    return [row[-1] for row in rows]
+
+
+def bench_indexes(app, args):
+    """Check that the hot Note/QueryLog filters are served by an index, not a table scan"""
+    from sqlalchemy import and_, desc, func, select, tuple_
+    seed_notes(app, min(args.participants, 1000), args.notes_per_participant)
+    with app.engine.begin() as conn:
+        conn.exec_driver_sql("ANALYZE")
+
+    Note, QueryLog, NotePractice = app.Note, app.QueryLog, app.NotePractice
+    since = datetime.utcnow() - timedelta(hours=24)
+    db = app.SessionLocal()
+    try:
+        user_id = db.query(app.User.id).first()[0]
+        participant_id = db.query(app.Participant.id).first()[0]
+        queries = {
+            "training trigger: RP notes": db.query(Note).filter(and_(
+                Note.user_id == user_id, Note.timestamp >= since, Note.rp_flag == True
+            )),
+            "training trigger: queries": db.query(QueryLog).filter(and_(
+                QueryLog.user_id == user_id, QueryLog.timestamp >= since
+            )),
+            "stats: my notes": db.query(func.count(Note.id)).filter(Note.user_id == user_id),
+            "notes: participant page": db.query(Note).filter(
+                Note.participant_id == participant_id
+            ).order_by(desc(Note.timestamp), desc(Note.id)).limit(50),
+            "notes: keyset page": db.query(Note).filter(
+                tuple_(Note.timestamp, Note.id) < (since, "x")
+            ).order_by(desc(Note.timestamp), desc(Note.id)).limit(50),
+            "reanalysis: next batch": db.query(Note.id, Note.text, Note.timestamp, Note.rp_flag).filter(
+                tuple_(Note.timestamp, Note.id) > (since, "x")
+            ).order_by(Note.timestamp, Note.id).limit(200),
+            "reanalysis: participant batch": db.query(Note.id, Note.text, Note.timestamp, Note.rp_flag).filter(
+                Note.participant_id == participant_id,
+                tuple_(Note.timestamp, Note.id) > (since, "x")
+            ).order_by(Note.timestamp, Note.id).limit(200),
+            "export: participant + dates": db.query(Note).filter(
+                Note.participant_id == participant_id,
+                Note.timestamp >= since - timedelta(days=365),
+                Note.timestamp <= since
+            ).order_by(desc(Note.timestamp)),
+            "notes: by practice": db.query(Note).filter(Note.id.in_(
+                select(NotePractice.note_id).where(NotePractice.practice == "locked door")
+            )).order_by(desc(Note.timestamp), desc(Note.id)).limit(50),
+            "notes: by severity": db.query(Note).filter(
+                Note.severity == "high"
+            ).order_by(desc(Note.timestamp), desc(Note.id)).limit(50),
+            "stats: practice counts": db.query(
+                NotePractice.practice, NotePractice.category, func.count(NotePractice.id)
+            ).group_by(NotePractice.practice, NotePractice.category),
+            "stats: severity counts": db.query(Note.severity, func.count(Note.id)).filter(
+                Note.severity.isnot(None)
+            ).group_by(Note.severity),
+        }
+        # Keyset and range probes must seek into their index; even "SCAN ... USING INDEX" walks
+        # every row before the range, so their cost grows with how deep the page or window is
+        seeks = {
+            "training trigger: RP notes",
+            "training trigger: queries",
+            "notes: keyset page",
+            "reanalysis: next batch",
+            "reanalysis: participant batch",
+            "export: participant + dates",
+        }
+
+        failures = 0
+        for label, query in queries.items():
+            plan = explain(app, query)
+            if label in seeks:
+                scan = any(line.startswith("SCAN") for line in plan)
+            else:
+                # Elsewhere only a bare "SCAN <table>" without an index is a full table scan
+                scan = any(line.startswith("SCAN") and "INDEX" not in line for line in plan)
+            failures += scan
+            status = "SCAN" if label in seeks else "FULL SCAN"
+            print(f"{status if scan else 'ok':<10} {label}")
+            for line in plan:
+                print(f"{'':<10}   {line}")
+    finally:
+        db.close()
+
+    if failures:
+        sys.exit(f"{failures} queries scan instead of seeking an index")
+
+
+def bench_search(app, args):
+    """GET /api/notes/search latency over the seeded notes"""
+    seed_notes(app, args.participants, args.notes_per_participant)
+    db = app.SessionLocal()
+    try:
+        participant_id = db.query(app.Participant.id).first()[0]
+    finally:
+        db.close()
+
+    searches = {
+        "single term": {"q": "cricket"},
+        "phrase terms": {"q": "locked back door"},
+        "prefix": {"q": "restrain"},
+        "common term": {"q": "the"},
+        "participant filter": {"q": "medication", "participant_id": participant_id},
+        "date filter": {"q": "swimming", "start_date": (datetime.utcnow() - timedelta(days=25)).isoformat()},
+    }
+
+    print(f"{args.participants * args.notes_per_participant} notes, search backend: {app.note_search_backend}")
+    for label, params in searches.items():
+        def search():
+            call_handler(app, app.search_notes, current_user=None, **{"limit": 20, **params})
+        timed(label, app.async_engine.sync_engine, search)
+
+
+def bench_similar(app, args):
+    """Embedding index build time and top-k lookup latency"""
+    seed_notes(app, args.participants, args.notes_per_participant)
+    total = args.participants * args.notes_per_participant
+
+    start = time.perf_counter()
+    app.sync_note_index()
+    elapsed = time.perf_counter() - start
+    stats = app.note_index.stats()
+    print(f"{total} notes, {stats['model']}: indexed in {elapsed:.1f}s, {stats['bytes'] / 1e6:.1f} MB")
+
+    db = app.SessionLocal()
+    try:
+        note_id, participant_id = db.query(app.Note.id, app.Note.participant_id).first()
+    finally:
+        db.close()
+
+    for label, fn in {
+        "top-10 all notes": lambda: app.note_index.similar_to(note_id, 10),
+        "top-10 same participant": lambda: app.note_index.similar_to(note_id, 10, participant_id),
+        "top-10 free text": lambda: app.note_index.search_text("locked the back door", 10),
+    }.items():
+        best = min(timeit_once(fn) for _ in range(5))
+        print(f"{label:<32} {best * 1000:>10.1f} ms")
+
+
+def timeit_once(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def bench_writes(app, args):
+    """Concurrent note writes with dashboard readers: default engine vs configured engine"""
+    from sqlalchemy import create_engine, func
+    from sqlalchemy.exc import OperationalError
+    from sqlalchemy.orm import sessionmaker
+    from database import create_db_engine, pool_stats
+
+    configs = {
+        "default engine": lambda url: create_engine(url, connect_args={"check_same_thread": False}),
+        "create_db_engine (WAL)": create_db_engine,
+    }
+    tmp = os.path.dirname(app.DATABASE_URL.replace("sqlite:///", ""))
+    total = args.threads * args.writes_per_thread
+    print(f"{args.threads} writer threads x {args.writes_per_thread} notes, {args.readers} reader threads")
+
+    for i, (label, make_engine) in enumerate(configs.items()):
+        engine = make_engine(f"sqlite:///{os.path.join(tmp, f'writes_{i}.db')}")
+        app.Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+        db = Session()
+        user = app.User(firebase_uid="bench", name="Bench", email="bench@careiq.com")
+        participant = app.Participant(name="Bench Participant")
+        db.add_all([user, participant])
+        db.commit()
+        user_id, participant_id = user.id, participant.id
+        db.close()
+
+        errors = []
+        done = threading.Event()
+
+        def writer(n):
+            for i in range(args.writes_per_thread):
+                db = Session()
+                try:
+                    db.add(app.Note(participant_id=participant_id, user_id=user_id, text=f"Bench note {n}-{i}"))
+                    app.bump_stats(db, notes=1, **{app.user_notes_key(user_id): 1})
+                    db.commit()
+                except OperationalError as e:
+                    db.rollback()
+                    errors.append(str(e.orig))
+                finally:
+                    db.close()
+
+        def reader():
+            while not done.is_set():
+                db = Session()
+                try:
+                    db.query(func.count(app.Note.id)).filter(app.Note.user_id == user_id).scalar()
+                    for _ in db.query(app.Note.id, app.Note.text).yield_per(100):
+                        pass
+                except OperationalError as e:
+                    errors.append(str(e.orig))
+                finally:
+                    db.close()
+
+        readers = [threading.Thread(target=reader) for _ in range(args.readers)]
+        writers = [threading.Thread(target=writer, args=(n,)) for n in range(args.threads)]
+        for t in readers:
+            t.start()
+        start = time.perf_counter()
+        for t in writers:
+            t.start()
+        for t in writers:
+            t.join()
+        elapsed = time.perf_counter() - start
+        done.set()
+        for t in readers:
+            t.join()
+
+        written = total - sum(1 for e in errors if "locked" in e)
+        print(f"{label:<24} {written / elapsed:>8.0f} writes/s {len(errors):>6} errors ({elapsed:.1f}s)")
+        print(f"{'':<24} {pool_stats(engine)['status']}")
+        engine.dispose()
+
+
+def bench_concurrency(app, args):
+    """Requests/sec under concurrent clients: sync Session on the event loop vs AsyncSession
+
+    Both apps serve the same statements. /notes pages recent notes with their
+    participant, /count is the dashboard total, and /upstream awaits a fixed delay
+    standing in for an OpenAI or Whisper call before a small lookup. With the
+    sync session every query stalls the loop, so the upstream waits stop overlapping.
+    """
+    import httpx
+    from fastapi import FastAPI, Depends
+    from sqlalchemy import select, desc, func
+    from sqlalchemy.orm import joinedload
+
+    seed_notes(app, args.participants, args.notes_per_participant)
+    upstream_seconds = args.upstream_ms / 1000
+
+    def notes_page():
+        return select(app.Note).options(joinedload(app.Note.participant)).order_by(desc(app.Note.timestamp)).limit(50)
+
+    def note_count():
+        return select(func.count(app.Note.id))
+
+    def participant_lookup():
+        return select(app.Participant.name).limit(1)
+
+    baseline = FastAPI()
+
+    @baseline.get("/notes")
+    async def sync_notes(db=Depends(app.get_db)):
+        return len(db.execute(notes_page()).scalars().all())
+
+    @baseline.get("/count")
+    async def sync_count(db=Depends(app.get_db)):
+        return db.execute(note_count()).scalar()
+
+    @baseline.get("/upstream")
+    async def sync_upstream(db=Depends(app.get_db)):
+        await asyncio.sleep(upstream_seconds)
+        return db.execute(participant_lookup()).scalar()
+
+    current = FastAPI()
+
+    @current.get("/notes")
+    async def async_notes(db=Depends(app.get_async_db)):
+        return len((await db.execute(notes_page())).scalars().all())
+
+    @current.get("/count")
+    async def async_count(db=Depends(app.get_async_db)):
+        return (await db.execute(note_count())).scalar()
+
+    @current.get("/upstream")
+    async def async_upstream(db=Depends(app.get_async_db)):
+        await asyncio.sleep(upstream_seconds)
+        return (await db.execute(participant_lookup())).scalar()
+
+    paths = ["/notes", "/count", "/upstream"]
+
+    async def load(asgi_app):
+        latencies = {path: [] for path in paths}
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            async def client_loop(n):
+                for i in range(args.requests_per_client):
+                    path = paths[(n + i) % len(paths)]
+                    start = time.perf_counter()
+                    response = await client.get(path)
+                    response.raise_for_status()
+                    latencies[path].append(time.perf_counter() - start)
+
+            await client_loop(0)  # warm the pools
+            latencies = {path: [] for path in paths}
+            start = time.perf_counter()
+            await asyncio.gather(*[client_loop(n) for n in range(args.clients)])
+            return time.perf_counter() - start, latencies
+
+    def percentile(values, p):
+        values = sorted(values)
+        return values[min(len(values) - 1, int(len(values) * p))] * 1000
+
+    total = args.clients * args.requests_per_client
+    print(f"{args.participants * args.notes_per_participant} notes, {args.clients} clients x "
+          f"{args.requests_per_client} requests, upstream wait {args.upstream_ms} ms")
+    for label, asgi_app in (("sync Session", baseline), ("AsyncSession", current)):
+        elapsed, latencies = loop.run_until_complete(load(asgi_app))
+        print(f"{label:<16} {total / elapsed:>8.0f} req/s")
+        for path in paths:
+            print(f"  {path:<14} p50 {percentile(latencies[path], 0.5):>8.1f} ms   "
+                  f"p95 {percentile(latencies[path], 0.95):>8.1f} ms")
+
+
+def local_signing_key(directory: str, kid: str = "bench-key"):
+    """RSA key and a FIREBASE_CERTS_FILE-style {kid: certificate} file for signing test ID tokens"""
+    from cryptography import x509
+    from cryptography.x509.oid import NameOID
+    from cryptography.hazmat.primitives import hashes, serialization
+    from cryptography.hazmat.primitives.asymmetric import rsa
+
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "careiq-bench")])
+    cert = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(datetime.utcnow() - timedelta(days=1))
+        .not_valid_after(datetime.utcnow() + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    certs_file = os.path.join(directory, "certs.json")
+    with open(certs_file, "w") as f:
+        json.dump({kid: cert.public_bytes(serialization.Encoding.PEM).decode()}, f)
+    return key, kid, certs_file
+
+
+def bench_auth(app, args):
+    """Auth dependency cost per request: uncached verification vs token, key and user caches"""
+    import jwt
+    from auth_cache import ExpiringLRU, FirebaseTokenVerifier, PublicKeyCache
+    from providers import Provider
+
+    project_id = "careiq-bench"
+    key, kid, certs_file = local_signing_key(os.path.dirname(app.DATABASE_URL.replace("sqlite:///", "")))
+    os.environ["DISABLE_AUTH"] = "false"
+
+    now = int(time.time())
+    users = max(1, args.requests // 3)  # a dashboard refresh sends three requests with one token
+    tokens = [
+        jwt.encode({
+            "iss": f"https://securetoken.google.com/{project_id}", "aud": project_id,
+            "sub": f"bench-user-{i}", "iat": now, "exp": now + 3600, "auth_time": now,
+            "email": f"bench{i}@careiq.com", "name": f"Bench {i}",
+        }, key, algorithm="RS256", headers={"kid": kid})
+        for i in range(users)
+    ]
+    requests = [tokens[i // 3 % users] for i in range(args.requests)]
+
+    def use_local_keys():
+        verifier = FirebaseTokenVerifier(project_id, PublicKeyCache(certs_file=certs_file))
+
+        async def load():
+            return verifier.verify
+        app.firebase_verifier = verifier
+        app.firebase_provider = Provider("firebase", load)
+
+    async def authenticate(token, db):
+        token_data = await app.verify_firebase_token(authorization=f"Bearer {token}")
+        return await app.get_current_user(token_data=token_data, db=db)
+
+    # Create the users so every run measures lookups, not inserts
+    use_local_keys()
+    for token in tokens:
+        call_handler(app, authenticate, token=token)
+
+    def run(label, keys_cached, caches, warm=False):
+        if not warm:
+            app.token_cache = ExpiringLRU(app.AUTH_TOKEN_CACHE_SIZE if caches else 0)
+            app.user_cache = ExpiringLRU(app.AUTH_USER_CACHE_SIZE if caches else 0)
+            use_local_keys()
+
+        async def requests_loop():
+            for token in requests:
+                if not keys_cached:
+                    # What verify_id_token does: reload and parse the certificates on every call
+                    app.firebase_verifier.keys = PublicKeyCache(certs_file=certs_file)
+                async with app.AsyncSessionLocal() as db:
+                    await authenticate(token, db)
+
+        with count_queries(app.async_engine.sync_engine) as counter:
+            start = time.perf_counter()
+            loop.run_until_complete(requests_loop())
+            elapsed = time.perf_counter() - start
+        print(f"{label:<32} {elapsed / len(requests) * 1e6:>8.0f} us/request {counter['queries']:>8} queries")
+        return elapsed
+
+    print(f"{args.requests} requests, {users} tokens")
+    before = run("no caches", keys_cached=False, caches=False)
+    run("signing keys cached", keys_cached=True, caches=False)
+    run("token + key + user caches", keys_cached=True, caches=True)
+    after = run("warm caches", keys_cached=True, caches=True, warm=True)
+    print(f"speedup (warm): {before / after:.1f}x")
+
+
+STARTUP_PROBE = """
+import json, time
+start = time.perf_counter()
+import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app.app) as client:
+    client.get("/api/health").raise_for_status()
+    serving = time.perf_counter()
+    while client.get("/api/ready").status_code != 200 and time.perf_counter() - serving < 120:
+        time.sleep(0.05)
+    ready = time.perf_counter()
+    while not app.whisper_provider.ready and time.perf_counter() - serving < 300:
+        time.sleep(0.05)
+    voice = time.perf_counter()
+    print(json.dumps({
+        "import": imported - start, "serving": serving - start, "ready": ready - start, "voice": voice - start,
+        "providers": {name: p.status() for name, p in app.providers.items()},
+    }))
+"""
+
+
+def bench_startup(app, args):
+    """Cold start of a fresh worker against a seeded database: import, first /api/health, /api/ready, Whisper warm"""
+    import subprocess
+    seed_notes(app, args.participants, args.notes_per_participant)
+    print(f"{args.participants * args.notes_per_participant} notes in the database")
+    backend = os.path.dirname(os.path.abspath(__file__))
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [backend, os.environ.get("PYTHONPATH")]))}
+
+    runs = []
+    for _ in range(3):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", STARTUP_PROBE],
+                                capture_output=True, text=True, env=env, cwd=backend)
+        if result.returncode != 0:
+            sys.exit(result.stderr[-2000:])
+        runs.append((json.loads(result.stdout.strip().splitlines()[-1]), result.stderr))
+
+    best, importtime = min(runs, key=lambda run: run[0]["serving"])
+    for label in ("import", "serving", "ready", "voice"):
+        print(f"{label + ' (s)':<32} {best[label]:>10.3f}")
+    for name, status in best["providers"].items():
+        print(f"  {name:<30} {status['state']:<8} {status['load_seconds'] or 0:>8.3f} s")
+
+    # Top-level modules by cumulative import time (microseconds) from -X importtime
+    modules = []
+    for line in importtime.splitlines():
+        parts = line.split("|")
+        if line.startswith("import time:") and len(parts) == 3 and parts[2].startswith("   ") and not parts[2].startswith("    "):
+            modules.append((int(parts[1]), parts[2].strip()))
+    print("slowest imports:")
+    for cumulative, module in sorted(modules, reverse=True)[:8]:
+        print(f"  {module:<30} {cumulative / 1000:>8.1f} ms")
+
+
+def synthetic_recording(seconds: float, rng: random.Random):
+    """16 kHz float32 samples: bursts of modulated tone ("speech") between noisy pauses"""
+    import numpy as np
+    sample_rate = 16000
+    parts = []
+    remaining = seconds
+    while remaining > 0:
+        speech = min(remaining, rng.uniform(1.0, 6.0))
+        t = np.arange(int(speech * sample_rate)) / sample_rate
+        parts.append(0.3 * np.sin(2 * np.pi * rng.uniform(120, 300) * t) * (1 + 0.5 * np.sin(2 * np.pi * 3 * t)))
+        pause = min(remaining - speech, rng.uniform(0.2, 4.0))
+        parts.append(np.zeros(int(pause * sample_rate)))
+        remaining -= speech + pause
+    samples = np.concatenate(parts)
+    samples += 0.002 * np.random.default_rng(0).standard_normal(len(samples))
+    return samples.astype(np.float32)
+
+
+def encode_opus(samples) -> bytes:
+    """webm/opus bytes, as a browser MediaRecorder would upload"""
+    import subprocess
+    import numpy as np
+    pcm = (np.clip(samples, -1, 1) * 32767).astype(np.int16).tobytes()
+    return subprocess.run(
+        ["ffmpeg", "-nostdin", "-loglevel", "error", "-f", "s16le", "-ar", "16000", "-ac", "1", "-i", "pipe:0",
+         "-c:a", "libopus", "-f", "webm", "pipe:1"],
+        input=pcm, capture_output=True, check=True
+    ).stdout
+
+
+def bench_audio(app, args):
+    """Voice upload preprocessing: decode + VAD trim time, speech kept, and peak memory per request"""
+    import tracemalloc
+    from audio import prepare_audio
+
+    rng = random.Random(42)
+    print(f"{'recording':<12} {'upload':>9} {'decode+trim':>12} {'speech':>9} {'traced peak':>12} {'estimated':>10}")
+    for seconds in args.seconds:
+        upload = encode_opus(synthetic_recording(seconds, rng))
+        temp_files = set(os.listdir(tempfile.gettempdir()))
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        prepared = loop.run_until_complete(prepare_audio(upload, max_seconds=max(args.seconds) + 1))
+        elapsed = time.perf_counter() - start
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        leaked = set(os.listdir(tempfile.gettempdir())) - temp_files
+        print(f"{seconds:>8.0f} s   {len(upload) / 1e6:>6.2f} MB {elapsed * 1000:>9.0f} ms "
+              f"{prepared.speech_duration:>7.1f} s {(traced_peak + len(upload)) / 1e6:>9.1f} MB "
+              f"{prepared.peak_bytes / 1e6:>7.1f} MB" + (f"  temp files: {sorted(leaked)}" if leaked else ""))
+
+
+def bench_whisper(app, args):
+    """Concurrent uploads through the transcription pool: per-request transcribe() vs batch sizes"""
+    from transcription import TranscriptionPool
+    try:
+        import whisper  # noqa: F401
+    except ImportError:
+        sys.exit("openai-whisper is not installed")
+
+    rng = random.Random(42)
+    # One 30s segment per upload, like a short voice note after silence trimming
+    uploads = [synthetic_recording(30, rng) for _ in range(args.uploads)]
+    audio_seconds = 30 * len(uploads)
+
+    async def run(pool):
+        await pool.start()
+        await pool.transcribe(uploads[0])  # warm up
+        warmup_batches = pool.metrics["batches"]
+        latencies = []
+
+        async def upload(samples):
+            start = time.perf_counter()
+            await pool.transcribe(samples)
+            latencies.append(time.perf_counter() - start)
+
+        cpu, start = time.process_time(), time.perf_counter()
+        await asyncio.gather(*[upload(samples) for samples in uploads])
+        elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu
+        pool.shutdown()
+        return elapsed, cpu, sorted(latencies), pool.metrics["batches"] - warmup_batches
+
+    print(f"{len(uploads)} concurrent 30s uploads, model {args.model}, in-process worker")
+    configs = [("transcribe() per upload", 0)] + [(f"batch size {size}", size) for size in args.batch_sizes]
+    for label, batch_size in configs:
+        pool = TranscriptionPool(args.model, workers=0, max_queue=len(uploads), batch_size=batch_size,
+                                 batch_wait_ms=args.batch_wait_ms)
+        elapsed, cpu, latencies, batches = loop.run_until_complete(run(pool))
+        print(f"{label:<26} {audio_seconds / elapsed:>7.1f} audio s/s {audio_seconds / cpu:>7.1f} audio s/CPU s "
+              f"p50 {latencies[len(latencies) // 2]:>6.1f} s  batches {batches}")
+
+
+BENCHMARKS = {
+    "participants": bench_participants,
+    "indexes": bench_indexes,
+    "search": bench_search,
+    "similar": bench_similar,
+    "writes": bench_writes,
+    "concurrency": bench_concurrency,
+    "auth": bench_auth,
+    "startup": bench_startup,
+    "audio": bench_audio,
+    "whisper": bench_whisper,
+}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CareIQ benchmarks")
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--participants", type=int, default=10000)
+    parser.add_argument("--notes-per-participant", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--writes-per-thread", type=int, default=200)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--requests-per-client", type=int, default=25)
+    parser.add_argument("--upstream-ms", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--seconds", type=float, nargs="+", default=[60, 300, 600])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--uploads", type=int, default=16)
+    parser.add_argument("--batch-wait-ms", type=int, default=50)
+    parser.add_argument("--model", default="tiny")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = load_app(os.path.join(tmp, "bench.db"))
+        BENCHMARKS[args.benchmark](app, args)
+        app.engine.dispose()
+        loop.run_until_complete(app.async_engine.dispose())
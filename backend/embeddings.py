@@ -0,0 +1,295 @@
+"""Local embedding index over note text for similar-note retrieval.
+
+Vectors are L2-normalized float32 rows appended to a flat binary file and
+memory-mapped for search, so a lookup is a single matrix-vector product.
+Row i of the matrix belongs to line i of the ids file (note id, participant id).
+
+Several uvicorn workers can share one index directory: appends take an
+exclusive flock on index.lock and first read the id lines other processes
+added, so both files grow in the same order and every process maps row i to
+the same note. Platforms without fcntl (Windows) support a single worker only.
+
+Embeddings come from a CPU sentence-transformers model when the package is
+installed, otherwise from a feature-hashing bag of words and bigrams that
+needs nothing beyond NumPy.
+"""
+import os
+import re
+import json
+import zlib
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Tuple, Optional, Dict, Any
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+TOKEN = re.compile(r"[a-z0-9']+")
+STOPWORDS = {
+    "a", "an", "the", "and", "or", "but", "to", "of", "in", "on", "at", "for", "with", "was",
+    "were", "is", "are", "be", "been", "he", "she", "they", "him", "her", "them", "his", "their",
+    "it", "this", "that", "as", "by", "from", "had", "has", "have", "after", "then", "so",
+}
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class HashingEmbedder:
+    """Signed feature hashing of words and bigrams - no model download, deterministic across processes"""
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = [w for w in TOKEN.findall(text.lower()) if w not in STOPWORDS]
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                h = zlib.crc32(feature.encode("utf-8"))
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return normalize_rows(vectors)
+
+
+class SentenceTransformerEmbedder:
+    """sentence-transformers model pinned to the CPU"""
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = model_name
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = self.model.encode(texts, batch_size=64, normalize_embeddings=True, convert_to_numpy=True)
+        return vectors.astype(np.float32)
+
+
+def load_embedder(model_name: str):
+    """The requested sentence-transformers model, or the hashing embedder when it is unavailable"""
+    if model_name and model_name != "hashing":
+        try:
+            return SentenceTransformerEmbedder(model_name)
+        except ImportError:
+            logger.warning("sentence-transformers not installed, using hashing embeddings")
+        except Exception as e:
+            logger.warning(f"Failed to load embedding model {model_name}: {e}. Using hashing embeddings.")
+    return HashingEmbedder()
+
+
+class NoteIndex:
+    """Append-only, memory-mapped embedding matrix with vectorized top-k search"""
+
+    def __init__(self, directory: str, model_name: str):
+        self.directory = Path(directory)
+        self.model_name = model_name
+        self.vectors_path = self.directory / "vectors.f32"
+        self.ids_path = self.directory / "ids.tsv"
+        self.meta_path = self.directory / "meta.json"
+        self.lock_path = self.directory / "index.lock"
+        self.embedder = None
+        self.lock = threading.Lock()
+        self.note_ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.participant_codes: Dict[str, int] = {}
+        self.codes = np.empty(1024, dtype=np.int32)  # participant code per row, grown by doubling
+        self.matrix: Optional[np.ndarray] = None
+        self.ids_offset = 0  # bytes of the ids file already mapped to rows
+
+    @property
+    def ready(self) -> bool:
+        return self.embedder is not None
+
+    @property
+    def dim(self) -> int:
+        return self.embedder.dim
+
+    @contextmanager
+    def _file_lock(self, exclusive: bool = True):
+        """Cross-process lock on the index files"""
+        if fcntl is None:
+            yield
+            return
+        with open(self.lock_path, "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def open(self):
+        """Load the embedder and the stored index, discarding it if the model changed"""
+        embedder = load_embedder(self.model_name)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if fcntl is None:
+            logger.warning("fcntl unavailable: run a single worker process per note index directory")
+        with self._file_lock():
+            self._open_locked(embedder)
+
+    def _open_locked(self, embedder):
+        meta = {"model": embedder.name, "dim": embedder.dim}
+
+        stored = json.loads(self.meta_path.read_text()) if self.meta_path.exists() else None
+        if stored != meta:
+            if stored:
+                logger.info(f"Embedding model changed ({stored} -> {meta}), rebuilding note index")
+            for path in (self.vectors_path, self.ids_path):
+                path.unlink(missing_ok=True)
+            self.meta_path.write_text(json.dumps(meta))
+
+        data = self.ids_path.read_bytes() if self.ids_path.exists() else b""
+        end = data.rfind(b"\n") + 1
+        entries = [line.split("\t") for line in data[:end].decode("utf-8").splitlines()]
+        vector_rows = self.vectors_path.stat().st_size // (embedder.dim * 4) if self.vectors_path.exists() else 0
+
+        # A crash between the two appends leaves them out of step; keep the common prefix
+        count = min(len(entries), vector_rows)
+        if count != len(entries) or count != vector_rows or end != len(data):
+            logger.warning(f"Note index truncated to {count} rows ({len(entries)} ids, {vector_rows} vectors)")
+            self.ids_path.write_bytes("".join(
+                f"{note_id}\t{participant_id}\n" for note_id, participant_id in entries[:count]
+            ).encode("utf-8"))
+        self.ids_path.touch()
+        if self.vectors_path.exists():
+            os.truncate(self.vectors_path, count * embedder.dim * 4)
+        else:
+            self.vectors_path.touch()
+
+        with self.lock:
+            self.embedder = embedder
+            self.note_ids = []
+            self.rows = {}
+            self.participant_codes = {}
+            self.matrix = None
+            self.ids_offset = self.ids_path.stat().st_size
+            self._append_ids(entries[:count])
+        logger.info(f"Note index opened: {count} notes, {embedder.name} ({embedder.dim} dims)")
+
+    def _append_ids(self, entries: List[List[str]]):
+        needed = len(self.note_ids) + len(entries)
+        if needed > len(self.codes):
+            grown = np.empty(max(needed, len(self.codes) * 2), dtype=np.int32)
+            grown[:len(self.note_ids)] = self.codes[:len(self.note_ids)]
+            self.codes = grown
+        for note_id, participant_id in entries:
+            row = len(self.note_ids)
+            self.note_ids.append(note_id)
+            self.rows[note_id] = row
+            self.codes[row] = self.participant_codes.setdefault(participant_id, len(self.participant_codes))
+
+    def _catch_up(self):
+        """Map id lines other processes appended since our last read (file lock and self.lock held)"""
+        if not self.ids_path.exists():
+            return
+        with open(self.ids_path, "rb") as f:
+            f.seek(self.ids_offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1  # a line without its newline is a crashed append
+        if end:
+            self.ids_offset += end
+            self._append_ids([line.split("\t") for line in data[:end].decode("utf-8").splitlines()])
+
+    def refresh(self):
+        """Pick up notes other worker processes added to the shared index"""
+        if self.ids_path.exists() and self.ids_path.stat().st_size > self.ids_offset:
+            with self.lock, self._file_lock(exclusive=False):
+                self._catch_up()
+
+    def _mapped(self) -> np.ndarray:
+        # Re-map after appends; mapping an existing file is cheap
+        n = len(self.note_ids)
+        if self.matrix is None or len(self.matrix) != n:
+            if n == 0:
+                self.matrix = np.zeros((0, self.dim), dtype=np.float32)
+            else:
+                self.matrix = np.memmap(self.vectors_path, dtype=np.float32, mode="r", shape=(n, self.dim))
+        return self.matrix
+
+    def __contains__(self, note_id: str) -> bool:
+        return note_id in self.rows
+
+    def __len__(self) -> int:
+        return len(self.note_ids)
+
+    def add(self, notes: List[Tuple[str, str, str]]) -> int:
+        """Embed and append (note_id, participant_id, text) rows not already indexed"""
+        notes = [n for n in notes if n[0] not in self.rows]
+        if not notes:
+            return 0
+        vectors = self.embedder.embed([text for _, _, text in notes])
+
+        with self.lock, self._file_lock():
+            self._catch_up()
+            fresh = [(n, v) for n, v in zip(notes, vectors) if n[0] not in self.rows]
+            if not fresh:
+                return 0
+            # Drop whatever a crashed append left past the last complete row
+            os.truncate(self.vectors_path, len(self.note_ids) * self.dim * 4)
+            os.truncate(self.ids_path, self.ids_offset)
+            with open(self.vectors_path, "ab") as f:
+                f.write(np.ascontiguousarray(np.stack([v for _, v in fresh]), dtype=np.float32).tobytes())
+            lines = "".join(f"{note_id}\t{participant_id}\n" for (note_id, participant_id, _), _ in fresh).encode("utf-8")
+            with open(self.ids_path, "ab") as f:
+                f.write(lines)
+            self.ids_offset += len(lines)
+            self._append_ids([[note_id, participant_id] for (note_id, participant_id, _), _ in fresh])
+        return len(fresh)
+
+    def search(self, vector: np.ndarray, k: int = 5, participant_id: Optional[str] = None,
+               exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Top-k (note_id, cosine similarity) for a normalized query vector"""
+        self.refresh()
+        with self.lock:
+            matrix = self._mapped()
+            codes = self.codes[:len(matrix)]
+            note_ids = self.note_ids
+            code = self.participant_codes.get(participant_id) if participant_id else None
+            excluded_row = self.rows.get(exclude) if exclude else None
+        if participant_id and code is None:
+            return []
+
+        scores = matrix @ vector.astype(np.float32)
+        if code is not None:
+            scores[codes != code] = -np.inf
+        if excluded_row is not None:
+            scores[excluded_row] = -np.inf
+
+        k = min(k, len(scores))
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        # Non-positive similarity means nothing in common
+        return [(note_ids[i], float(scores[i])) for i in top if scores[i] > 0]
+
+    def search_text(self, text: str, k: int = 5, participant_id: Optional[str] = None,
+                    exclude: Optional[str] = None) -> List[Tuple[str, float]]:
+        return self.search(self.embedder.embed([text])[0], k, participant_id, exclude)
+
+    def similar_to(self, note_id: str, k: int = 5, participant_id: Optional[str] = None) -> List[Tuple[str, float]]:
+        """Nearest neighbours of an indexed note, excluding the note itself"""
+        self.refresh()
+        with self.lock:
+            vector = np.array(self._mapped()[self.rows[note_id]])
+        return self.search(vector, k, participant_id, exclude=note_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "model": self.embedder.name if self.embedder else self.model_name,
+            "dim": self.embedder.dim if self.embedder else None,
+            "notes": len(self.note_ids),
+            "participants": len(self.participant_codes),
+            "bytes": self.vectors_path.stat().st_size if self.vectors_path.exists() else 0,
+        }
@@ -0,0 +1,79 @@
+"""Lazily initialized dependencies with readiness tracking.
+
+Slow setup (model loads, SDK initialization, network calls) runs in the
+background once the server is accepting requests instead of at import.
+Handlers await `provider.get()`, which starts initialization if needed and
+waits for it; /api/ready reports the state of every provider.
+"""
+import time
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderUnavailable(Exception):
+    """Raised by Provider.get() when initialization failed"""
+
+
+class Provider:
+    """A value produced once by an async factory, with its load state and timing"""
+
+    def __init__(self, name: str, factory: Callable[[], Awaitable[Any]], required: bool = True,
+                 retry_seconds: float = 30.0):
+        self.name = name
+        self.factory = factory
+        self.required = required  # /api/ready waits for required providers only
+        self.retry_seconds = retry_seconds
+        self.state = "pending"  # pending | loading | ready | failed
+        self.value: Any = None
+        self.error: Optional[str] = None
+        self.load_seconds: Optional[float] = None
+        self.failed_at = 0.0
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def start(self) -> asyncio.Task:
+        """Begin loading in the background; a failed load is retried after retry_seconds"""
+        if self.task is None or (self.state == "failed" and time.monotonic() - self.failed_at >= self.retry_seconds):
+            self.task = asyncio.create_task(self._load())
+        return self.task
+
+    async def _load(self):
+        self.state = "loading"
+        start = time.perf_counter()
+        try:
+            self.value = await self.factory()
+            self.state = "ready"
+            self.error = None
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            self.failed_at = time.monotonic()
+            logger.warning(f"Provider {self.name} failed to load: {e}")
+        finally:
+            self.load_seconds = round(time.perf_counter() - start, 3)
+        if self.ready:
+            logger.info(f"Provider {self.name} ready in {self.load_seconds}s")
+
+    async def get(self) -> Any:
+        """The loaded value, waiting for initialization if it is still running"""
+        if self.ready:
+            return self.value
+        # Shield so a cancelled request doesn't cancel the shared load
+        await asyncio.shield(self.start())
+        if not self.ready:
+            raise ProviderUnavailable(f"{self.name} unavailable: {self.error}")
+        return self.value
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "required": self.required,
+            "load_seconds": self.load_seconds,
+            "error": self.error,
+        }
@@ -0,0 +1,224 @@
+"""Local restrictive practice (RP) screening.
+
+A single compiled regex alternation scans each note once for a lexicon of
+restrictive practice phrases (the regex equivalent of an Aho-Corasick
+automaton). Hits preceded by a negation in the same clause are discounted,
+and weak cue words (doors, medication, aggression...) add a little risk.
+
+The lexicon only catches RP phrased the way it expects, so it is a screen,
+not a detector: `needs_llm` sends every note with any hit, negated hit or
+cue word to the LLM and only notes with none of them are answered locally.
+
+Run `python rp_classifier.py [fixtures.jsonl]` to report precision/recall
+against the labelled fixture set, which includes paraphrased RP the lexicon
+misses on purpose.
+"""
+import re
+import sys
+import json
+import argparse
+from pathlib import Path
+from typing import List, Dict, Any, Optional
+
+PRONOUN = r"(?:him|her|them|the participant|\w+)"
+POSSESSIVE = r"(?:his|her|their|the)"
+
+# (category, label, pattern, weight)
+RP_LEXICON = [
+    # Physical
+    ("physical", "physical restraint", r"physical(?:ly)?\s+restrain(?:ed|t|ts|ing)?", 1.0),
+    ("physical", "restrained", r"restrain(?:ed|ing|t|ts)?", 1.0),
+    ("physical", "held down", rf"held\s+(?:{PRONOUN}\s+){{0,2}}down|hold(?:ing)?\s+(?:{PRONOUN}\s+)?down", 1.0),
+    ("physical", "pinned", r"pinn(?:ed|ing)", 0.9),
+    ("physical", "restrictive hold", r"(?:prone|supine|basket|two[- ]person|bear)\s+hold", 1.0),
+    ("physical", "held limbs", rf"(?:held|holding|grabbed|grabbing|gripped)\s+{POSSESSIVE}\s+(?:arms?|hands?|wrists?|legs?|shoulders?)", 0.8),
+    ("physical", "held limbs", r"(?:held|grabbed|gripped|pulled)\s+(?:\w+\s+)?by\s+the\s+(?:arms?|hands?|wrists?|collar|shirt|hair)", 0.8),
+    ("physical", "forced", r"forc(?:ed|ing|ibly)", 0.8),
+    ("physical", "dragged", r"dragg(?:ed|ing)", 0.8),
+    ("physical", "pushed back", rf"push(?:ed|ing)\s+{PRONOUN}\s+(?:back|into|out|away)", 0.6),
+    ("physical", "carried", rf"carri(?:ed)\s+{PRONOUN}\s+(?:to|into|back)", 0.6),
+    # Environmental
+    ("environmental", "locked door", rf"lock(?:ed|ing)?\s+(?:{POSSESSIVE}\s+)?(?:front\s+|back\s+|bedroom\s+)?(?:doors?|room|gate|fridge|pantry|kitchen|cupboards?|windows?)", 1.0),
+    ("environmental", "locked door", r"(?:doors?|room|gate|fridge|pantry|cupboards?)\s+(?:was|were|is|are|been|kept)\s+(?:kept\s+)?(?:locked|deadlocked)", 1.0),
+    ("environmental", "locked in", r"locked\s+(?:\w+\s+)?(?:in|out)\b", 1.0),
+    ("environmental", "shut from outside", r"(?:locked|shut|closed|secured)\s+from\s+the\s+outside", 1.0),
+    ("environmental", "blocked door", rf"block(?:ed|ing)?\s+(?:{POSSESSIVE}\s+)?(?:doors?|doorway|exit|hallway|path|way out)", 1.0),
+    ("environmental", "prevented from leaving", r"prevent(?:ed|ing)?\s+(?:\w+\s+){0,2}from\s+(?:leaving|going|exiting)", 1.0),
+    ("environmental", "not allowed to leave", r"(?:can't|cannot|couldn't|could not|not allowed to|wasn't allowed to|weren't allowed to)\s+leave", 0.9),
+    ("environmental", "won't let", r"(?:won't|wouldn't|didn't|did not)\s+let\s+(?:\w+\s+)?(?:leave|go|out)", 0.9),
+    ("environmental", "kept inside", rf"kept\s+(?:{PRONOUN}\s+)?(?:inside|indoors|in\s+{POSSESSIVE}\s+room)", 0.8),
+    ("environmental", "restricted access", r"restrict(?:ed|ing)\s+(?:\w+\s+)?access", 0.8),
+    ("environmental", "removed belongings", rf"(?:took away|removed|confiscated)\s+{POSSESSIVE}\s+(?:phone|tablet|ipad|belongings|money|access)", 0.6),
+    # Chemical
+    ("chemical", "chemical restraint", r"chemical\s+restraint", 1.0),
+    ("chemical", "sedation", r"sedat(?:ed|ion|ive|ives|ing)", 0.9),
+    ("chemical", "prn for behaviour", r"prn\s+(?:was\s+)?(?:given|administered)|(?:gave|given|administered)\s+(?:\w+\s+)?prn", 0.7),
+    ("chemical", "psychotropic given", r"(?:gave|given|administered)\s+(?:\w+\s+)?(?:lorazepam|diazepam|midazolam|olanzapine|haloperidol|quetiapine|risperidone)", 0.9),
+    ("chemical", "medicated to calm", r"medicat(?:ed|ion)\s+(?:\w+\s+)?to\s+calm", 0.9),
+    ("chemical", "covert medication", r"covert(?:ly)?\s+(?:medicat|administ|gave|given)|(?:crushed|hid|hidden|mixed)\s+(?:\w+\s+)?(?:medication|meds|tablets?)\s+(?:into|in)", 1.0),
+    # Mechanical
+    ("mechanical", "mechanical restraint", r"mechanical\s+restraint", 1.0),
+    ("mechanical", "strapped", r"strapp(?:ed|ing)", 0.9),
+    ("mechanical", "tied", r"tied\s+(?:up|down|to)|tying\s+(?:\w+\s+)?(?:up|down|to)", 1.0),
+    ("mechanical", "restraint device", r"(?:wrist|ankle|arm)\s+(?:cuffs?|restraints?|ties?)|zip\s*ties?", 1.0),
+    ("mechanical", "lap belt", r"lap\s+belt|buckled\s+(?:\w+\s+)?(?:in|into)", 0.6),
+    ("mechanical", "bed rails", r"bed\s*rails?\s+(?:up|raised)", 0.6),
+    # Seclusion
+    ("seclusion", "seclusion", r"seclu(?:ded|sion)", 1.0),
+    ("seclusion", "isolated", r"isolat(?:ed|ion|ing)", 0.7),
+    ("seclusion", "time-out room", r"time[- ]?out\s+room", 0.9),
+    ("seclusion", "sent to room", rf"sent\s+(?:{PRONOUN}\s+)?to\s+{POSSESSIVE}\s+room", 0.7),
+    ("seclusion", "confined", r"confin(?:ed|ing|ement)", 0.8),
+    ("seclusion", "shut in", rf"shut\s+(?:{PRONOUN}\s+)?in\b", 0.8),
+    ("seclusion", "left alone in room", rf"left\s+(?:{PRONOUN}\s+)?alone\s+in\s+(?:a|{POSSESSIVE})\s+room", 0.7),
+]
+
+# Practice label -> category, for tagging stored detections
+PRACTICE_CATEGORIES = {label: category for category, label, _, _ in RP_LEXICON}
+
+# Category keywords for free-text practice names from the LLM ("Locked doors",
+# "Physical restraint (holding arms)"), most specific category first
+CATEGORY_HINTS = [
+    ("chemical", r"chemical|medicat\w*|meds|sedat\w*|prn|drugs?|tablets?"),
+    ("mechanical", r"mechanical|strap\w*|belts?|cuffs?|tied|ties|tying|rails?"),
+    ("seclusion", r"seclu\w*|isolat\w*|time[- ]?out|confin\w*|shut\s+in"),
+    ("environmental", r"environmental|lock\w*|block\w*|doors?|exits?|gates?|access|leav\w*"),
+    ("physical", r"physical\w*|restrain\w*|holds?|holding|held|pinn\w*|grab\w*|forc\w*|dragg\w*"),
+]
+
+# Words that do not indicate RP on their own but make a note worth a second look
+AMBIGUITY_CUES = [
+    r"door\w*", r"locks?", r"exit", r"medication|meds|prn|tablets?|pills?|medicine", r"agitat\w*", r"aggress\w*",
+    r"escalat\w*", r"hit|hitting|kick\w*|punch\w*|bit|bite|biting|scratch\w*",
+    r"refus\w*", r"upset", r"angry", r"yell\w*|scream\w*|shout\w*", r"held|hold\w*",
+    r"calm(?:ed)?\s+down", r"police", r"injur\w*", r"incident", r"behaviou?r",
+    # Physical contact, containment and concealment phrased without a lexicon term
+    r"(?:sat|lay|lying|knelt|kneeling|leant|leaning)\s+on", r"stood\s+in\s+front|in\s+front\s+of\s+the",
+    r"pull\w*\s+away|struggl\w*|resist\w*", r"hid|hidden|hiding|crush\w*|disguis\w*|covert\w*",
+    r"made\s+(?:\w+\s+)?to", r"kept\s+in", r"closed|shut",
+]
+
+NEGATION = re.compile(
+    r"\b(?:no|not|never|without|didn't|did not|wasn't|was not|weren't|were not|denied|"
+    r"avoid(?:ed|ing)?|instead of|rather than|no need to|refrained from|chose not to)\b"
+)
+CLAUSE_BREAK = re.compile(r"[.;!?\n]|\bbut\b|\bhowever\b")
+
+NEGATED_WEIGHT = 0.3
+AMBIGUITY_WEIGHT = 0.15
+NEGATION_WINDOW = 6  # words before a hit checked for negation
+
+
+class RPClassifier:
+    """Scores notes for restrictive practice risk in a single regex pass"""
+
+    def __init__(self, lexicon=RP_LEXICON, ambiguity_cues=AMBIGUITY_CUES):
+        self.terms = lexicon
+        self.pattern = re.compile(
+            "|".join(rf"(?P<t{i}>\b(?:{pattern})\b)" for i, (_, _, pattern, _) in enumerate(lexicon)),
+            re.IGNORECASE
+        )
+        self.ambiguity = re.compile(r"\b(?:" + "|".join(ambiguity_cues) + r")\b", re.IGNORECASE)
+        self.category_hints = [
+            (category, re.compile(rf"\b(?:{pattern})\b", re.IGNORECASE)) for category, pattern in CATEGORY_HINTS
+        ]
+
+    def _negated(self, text: str, start: int) -> bool:
+        clause = CLAUSE_BREAK.split(text[max(0, start - 80):start])[-1]
+        words = clause.split()[-NEGATION_WINDOW:]
+        return bool(NEGATION.search(" ".join(words)))
+
+    def classify(self, text: str) -> Dict[str, Any]:
+        """Return the risk score with the matched and negated practices"""
+        lowered = text.lower()
+        matches = []
+        negated = []
+        score = 0.0
+        covered = []
+        for m in self.pattern.finditer(lowered):
+            category, label, _, weight = self.terms[int(m.lastgroup[1:])]
+            covered.append((m.start(), m.end()))
+            if self._negated(lowered, m.start()):
+                negated.append(label)
+                score += weight * NEGATED_WEIGHT
+            else:
+                if label not in matches:
+                    matches.append(label)
+                score += weight
+
+        # Cue words inside an RP hit were already counted
+        cues = [
+            m.group(0) for m in self.ambiguity.finditer(lowered)
+            if not any(s <= m.start() < e for s, e in covered)
+        ]
+        score += AMBIGUITY_WEIGHT * len(cues)
+
+        return {
+            "risk": round(min(score, 1.0), 3),  # 0 only when nothing matched
+            "rp_flag": bool(matches),
+            "detected_practices": matches,
+            "negated_practices": negated,
+            "cues": cues,
+        }
+
+    def categorize(self, practice: str) -> Optional[str]:
+        """Category of a detected practice name, whether a lexicon label or free text from the LLM"""
+        name = practice.strip().lower()
+        if name in PRACTICE_CATEGORIES:
+            return PRACTICE_CATEGORIES[name]
+        for category, hint in self.category_hints:
+            if hint.search(name):
+                return category
+        match = self.pattern.search(name)
+        return self.terms[int(match.lastgroup[1:])][0] if match else None
+
+
+rp_classifier = RPClassifier()
+
+
+def needs_llm(result: Dict[str, Any]) -> bool:
+    """Whether a screened note must go to the LLM: anything matched, even a single cue word"""
+    return result["risk"] > 0
+
+
+def evaluate(fixtures: List[Dict[str, Any]], classifier: Optional[RPClassifier] = None) -> Dict[str, Any]:
+    """Precision/recall of the screening tier (needs_llm) and of the lexicon flag alone"""
+    classifier = classifier or rp_classifier
+    counts = {"tp": 0, "fp": 0, "fn": 0, "tn": 0}
+    flag_counts = {"tp": 0, "fp": 0, "fn": 0, "tn": 0}
+    missed = []
+    for fixture in fixtures:
+        result = classifier.classify(fixture["text"])
+        for bucket, predicted in ((counts, needs_llm(result)), (flag_counts, result["rp_flag"])):
+            key = ("t" if predicted == fixture["rp"] else "f") + ("p" if predicted else "n")
+            bucket[key] += 1
+        if fixture["rp"] and not needs_llm(result):
+            missed.append(fixture["text"])
+
+    def summary(c):
+        precision = c["tp"] / (c["tp"] + c["fp"]) if c["tp"] + c["fp"] else 0.0
+        recall = c["tp"] / (c["tp"] + c["fn"]) if c["tp"] + c["fn"] else 0.0
+        return {**c, "precision": round(precision, 3), "recall": round(recall, 3)}
+
+    return {
+        "fixtures": len(fixtures),
+        "screen": summary(counts),
+        "llm_skip_rate": round((counts["tn"] + counts["fn"]) / len(fixtures), 3) if fixtures else 0.0,
+        "rp_flag": summary(flag_counts),
+        "missed_rp": missed,
+    }
+
+
+def load_fixtures(path: Path) -> List[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report RP screening precision/recall")
+    parser.add_argument("fixtures", nargs="?", default=Path(__file__).with_name("rp_fixtures.jsonl"))
+    args = parser.parse_args()
+
+    report = evaluate(load_fixtures(args.fixtures))
+    json.dump(report, sys.stdout, indent=2)
+    print()
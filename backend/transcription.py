@@ -0,0 +1,336 @@
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional, Tuple, Dict, Any, Union, List
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000  # Whisper expects 16 kHz mono
+SEGMENT_SAMPLES = 30 * SAMPLE_RATE  # Whisper's fixed input window
+SPLIT_FRAME_SAMPLES = SAMPLE_RATE * 30 // 1000  # 30 ms energy frames, as in audio.py's VAD
+SPLIT_SEARCH_SAMPLES = 5 * SAMPLE_RATE  # how far before a window's end to look for a pause
+
+# Model loaded once per worker process (or once in-process when workers=0)
+_worker_model = None
+
+
+def _init_worker(model_name: str):
+    """Load the Whisper model when a worker starts so it stays warm"""
+    global _worker_model
+    try:
+        import whisper  # pulls in torch; only the process that transcribes pays for it
+        _worker_model = whisper.load_model(model_name)
+        logger.info(f"Whisper worker {os.getpid()} loaded model: {model_name}")
+    except Exception as e:
+        logger.warning(f"Failed to load Whisper model: {e}. Will use mock transcription.")
+        _worker_model = None
+
+
+def _warm_worker() -> bool:
+    return _worker_model is not None
+
+
+def _transcribe_job(audio: Union[str, np.ndarray]) -> Tuple[Optional[str], float]:
+    """Transcribe a file or float32 samples in the worker, returning (text, seconds spent in the model)"""
+    if _worker_model is None:
+        return None, 0.0
+    start = time.perf_counter()
+    result = _worker_model.transcribe(audio)
+    return result["text"].strip(), time.perf_counter() - start
+
+
+def _transcribe_batch_job(segments: List[np.ndarray]) -> Tuple[List[Optional[str]], float]:
+    """Decode up to 30s segments as one batch through the model, returning (texts, seconds spent in the model)"""
+    if _worker_model is None:
+        return [None] * len(segments), 0.0
+    import torch
+    import whisper
+    start = time.perf_counter()
+    mels = torch.stack([
+        whisper.log_mel_spectrogram(whisper.pad_or_trim(segment), n_mels=_worker_model.dims.n_mels)
+        for segment in segments
+    ]).to(_worker_model.device)
+    options = whisper.DecodingOptions(fp16=_worker_model.device.type == "cuda", without_timestamps=True)
+    results = whisper.decode(_worker_model, mels, options)
+    # Same no-speech rule transcribe() uses to drop a segment
+    texts = [
+        "" if result.no_speech_prob > 0.6 and result.avg_logprob < -1.0 else result.text.strip()
+        for result in results
+    ]
+    return texts, time.perf_counter() - start
+
+
+def split_segments(samples: np.ndarray) -> List[np.ndarray]:
+    """Cut samples into pieces of at most 30s, each ending at the quietest frame near its limit
+
+    Cutting at a fixed offset splits words across segments, which Whisper then
+    mangles or drops on both sides; the VAD-trimmed input keeps pauses short
+    but present, so the quietest 30 ms in the last few seconds is almost always one.
+    """
+    segments = []
+    start = 0
+    while len(samples) - start > SEGMENT_SAMPLES:
+        search_start = start + SEGMENT_SAMPLES - SPLIT_SEARCH_SAMPLES
+        frames = SPLIT_SEARCH_SAMPLES // SPLIT_FRAME_SAMPLES
+        blocks = samples[search_start:search_start + frames * SPLIT_FRAME_SAMPLES].reshape(frames, SPLIT_FRAME_SAMPLES)
+        quietest = int(np.argmin(np.einsum("ij,ij->i", blocks, blocks)))
+        cut = search_start + quietest * SPLIT_FRAME_SAMPLES + SPLIT_FRAME_SAMPLES // 2
+        segments.append(samples[start:cut])
+        start = cut
+    segments.append(samples[start:])
+    return segments
+
+
+class TranscriptionQueueFull(Exception):
+    """Raised when too many transcriptions are already waiting"""
+
+
+class TranscriptionUnavailable(Exception):
+    """Raised by callers that cannot fall back when the model gives no transcript"""
+
+
+class TranscriptionPool:
+    """Runs Whisper off the event loop in a pool of warm workers
+
+    With batch_size > 0, sample arrays are cut into segments of up to 30s at
+    pauses (see split_segments) and queued;
+    a scheduler gathers segments from concurrent requests for up to
+    batch_wait_ms (or until batch_size are waiting) and decodes each group
+    as one batch, then hands every request its own text back.
+    """
+
+    def __init__(self, model_name: str, workers: int = 1, max_queue: int = 8,
+                 batch_size: int = 0, batch_wait_ms: int = 50):
+        self.model_name = model_name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self.executor = None
+        self.model_loaded = False
+        self.pending = 0
+        self.segments: Optional[asyncio.Queue] = None
+        self.scheduler: Optional[asyncio.Task] = None
+        self.metrics = {
+            "jobs_completed": 0,
+            "jobs_failed": 0,
+            "jobs_rejected": 0,
+            "queue_wait_seconds_total": 0.0,
+            "transcribe_seconds_total": 0.0,
+            "transcribe_seconds_max": 0.0,
+            "batches": 0,
+            "batched_segments": 0,
+        }
+
+    async def start(self):
+        """Create the executor and load the model in every worker"""
+        if self.workers > 0:
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self.model_name,)
+            )
+        else:
+            # Single background thread sharing the model in this process
+            self.executor = ThreadPoolExecutor(
+                max_workers=1,
+                initializer=_init_worker,
+                initargs=(self.model_name,)
+            )
+        loop = asyncio.get_running_loop()
+        warm = await asyncio.gather(*[
+            loop.run_in_executor(self.executor, _warm_worker)
+            for _ in range(max(self.workers, 1))
+        ])
+        self.model_loaded = all(warm)
+        if self.batch_size > 0:
+            self.segments = asyncio.Queue()
+            self.scheduler = asyncio.create_task(self._schedule_batches())
+        logger.info(f"Transcription pool started ({self.workers} workers, model loaded: {self.model_loaded}, "
+                    f"batch size: {self.batch_size})")
+
+    def shutdown(self):
+        if self.scheduler:
+            self.scheduler.cancel()
+            self.scheduler = None
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    @property
+    def capacity(self) -> int:
+        return max(self.workers, 1) + self.max_queue
+
+    async def transcribe(self, audio: Union[str, np.ndarray]) -> Optional[str]:
+        """Transcribe an audio file or 16 kHz samples, or return None when no model is available"""
+        if self.pending >= self.capacity:
+            self.metrics["jobs_rejected"] += 1
+            raise TranscriptionQueueFull(f"{self.pending} transcriptions pending")
+
+        self.pending += 1
+        submitted = time.perf_counter()
+        try:
+            if self.scheduler and isinstance(audio, np.ndarray):
+                text, run_seconds = await self._transcribe_batched(audio)
+            else:
+                loop = asyncio.get_running_loop()
+                text, run_seconds = await loop.run_in_executor(self.executor, _transcribe_job, audio)
+        except Exception:
+            self.metrics["jobs_failed"] += 1
+            raise
+        finally:
+            self.pending -= 1
+
+        elapsed = time.perf_counter() - submitted
+        self.metrics["jobs_completed"] += 1
+        self.metrics["queue_wait_seconds_total"] += max(0.0, elapsed - run_seconds)
+        self.metrics["transcribe_seconds_total"] += run_seconds
+        self.metrics["transcribe_seconds_max"] = max(self.metrics["transcribe_seconds_max"], run_seconds)
+        logger.info(f"Transcription took {run_seconds:.2f}s (waited {elapsed - run_seconds:.2f}s)")
+        return text
+
+    async def _transcribe_batched(self, samples: np.ndarray) -> Tuple[Optional[str], float]:
+        """Queue each segment for the scheduler and join the texts in order"""
+        loop = asyncio.get_running_loop()
+        futures = []
+        for segment in split_segments(samples):
+            future = loop.create_future()
+            await self.segments.put((segment, future))
+            futures.append(future)
+        results = await asyncio.gather(*futures)
+
+        texts = [text for text, _, _ in results]
+        # Segments that shared a batch shared its model time
+        run_seconds = sum({batch: seconds for _, seconds, batch in results}.values())
+        if any(text is None for text in texts):
+            return None, run_seconds
+        return " ".join(text for text in texts if text), run_seconds
+
+    async def _schedule_batches(self):
+        """Gather queued segments into batches, one batch in flight per worker"""
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(max(self.workers, 1))
+        while True:
+            batch = [await self.segments.get()]
+            deadline = loop.time() + self.batch_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.segments.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await slots.acquire()
+            asyncio.create_task(self._run_batch(batch, slots))
+
+    async def _run_batch(self, batch: List[Tuple[np.ndarray, asyncio.Future]], slots: asyncio.Semaphore):
+        try:
+            loop = asyncio.get_running_loop()
+            texts, run_seconds = await loop.run_in_executor(
+                self.executor, _transcribe_batch_job, [segment for segment, _ in batch]
+            )
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            slots.release()
+
+        self.metrics["batches"] += 1
+        self.metrics["batched_segments"] += len(batch)
+        batch_id = self.metrics["batches"]
+        for (_, future), text in zip(batch, texts):
+            if not future.done():
+                future.set_result((text, run_seconds, batch_id))
+
+    def stats(self) -> Dict[str, Any]:
+        completed = self.metrics["jobs_completed"]
+        return {
+            "model": self.model_name,
+            "model_loaded": self.model_loaded,
+            "workers": self.workers,
+            "pending": self.pending,
+            "capacity": self.capacity,
+            "batch_size": self.batch_size,
+            "batch_wait_ms": round(self.batch_wait * 1000),
+            **self.metrics,
+            "batch_size_avg": round(self.metrics["batched_segments"] / self.metrics["batches"], 2) if self.metrics["batches"] else 0.0,
+            "queue_wait_seconds_avg": round(self.metrics["queue_wait_seconds_total"] / completed, 3) if completed else 0.0,
+            "transcribe_seconds_avg": round(self.metrics["transcribe_seconds_total"] / completed, 3) if completed else 0.0,
+        }
+
+
+class StreamingDecoder:
+    """Decodes a compressed audio stream incrementally into fixed-length sample windows
+
+    Chunks fed in (e.g. webm/opus from MediaRecorder) are piped through ffmpeg,
+    which emits 16 kHz mono PCM as soon as it can decode it. Complete windows
+    are put on `windows`; the trailing partial window and then None follow on close.
+    """
+
+    def __init__(self, window_seconds: int = 30):
+        self.window_samples = window_seconds * SAMPLE_RATE
+        self.windows: asyncio.Queue = asyncio.Queue()
+        self.total_samples = 0
+        self.process = None
+        self._reader = None
+
+    async def start(self):
+        self.process = await asyncio.create_subprocess_exec(
+            "ffmpeg", "-nostdin", "-loglevel", "error",
+            "-i", "pipe:0",
+            "-f", "s16le", "-ac", "1", "-ar", str(SAMPLE_RATE),
+            "pipe:1",
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE
+        )
+        self._reader = asyncio.create_task(self._read_pcm())
+
+    async def feed(self, chunk: bytes):
+        self.process.stdin.write(chunk)
+        await self.process.stdin.drain()
+
+    async def close(self):
+        """Signal end of input; remaining audio is flushed to `windows`"""
+        if self.process and not self.process.stdin.is_closing():
+            self.process.stdin.close()
+
+    async def abort(self):
+        if self.process and self.process.returncode is None:
+            self.process.kill()
+        if self._reader:
+            self._reader.cancel()
+
+    async def _read_pcm(self):
+        window_bytes = self.window_samples * 2
+        buffer = bytearray()
+        try:
+            while True:
+                data = await self.process.stdout.read(65536)
+                if not data:
+                    break
+                buffer.extend(data)
+                while len(buffer) >= window_bytes:
+                    await self._emit(bytes(buffer[:window_bytes]))
+                    del buffer[:window_bytes]
+            # Drop a dangling odd byte before converting
+            if len(buffer) >= 2:
+                await self._emit(bytes(buffer[:len(buffer) - len(buffer) % 2]))
+            await self.process.wait()
+        finally:
+            await self.windows.put(None)
+
+    async def _emit(self, pcm: bytes):
+        samples = np.frombuffer(pcm, dtype=np.int16).astype(np.float32) / 32768.0
+        self.total_samples += len(samples)
+        await self.windows.put(samples)
+
+    @property
+    def duration(self) -> float:
+        return self.total_samples / SAMPLE_RATE